@@ -3,20 +3,51 @@ from typing import Any, List, Optional
 from pydantic import Field
 import requests
 import json
-import toml
+import tomllib
 import os
 import re
 
 from app.agent.toolcall import ToolCallAgent
-from app.prompt.manus import NEXT_STEP_PROMPT, SYSTEM_PROMPT
+from app.config import config
+from app.prompt.manus import (
+    NEXT_STEP_PROMPT,
+    PROMPT_SHA,
+    SYSTEM_PROMPT,
+    SYSTEM_PROMPT_COMPACT,
+    render_next_step,
+)
 from app.tool import Terminate, ToolCollection
 from app.schema import AgentState, Message
+from app.tool.batch import BatchTool
 from app.tool.browser_use_tool import BrowserUseTool
+from app.tool.fetch_page import FetchPageTool
 from app.tool.file_saver import FileSaver
 from app.tool.web_search import WebSearch
 from app.tool.python_execute import PythonExecute
 from app.logger import logger
 from app.agent.url_fallback import URLFallbackHandler
+from app.utils.semantic_cache import SemanticCache, is_time_sensitive
+
+
+# Termos que indicam que a tarefa depende de informações atuais da internet
+WEB_QUERY_PATTERN = re.compile(
+    r"https?://|www\.|\.com\b|"
+    r"\b(?:clima|previs[ãa]o|pre[çc]os?|cota[çc][ãa]o|d[óo]lar|bolsa|hoje|agora|atua\w*|"
+    r"not[íi]cias?|[úu]ltim[oa]s?|recentes?|data|resultado|placar|"
+    r"pesquis\w*|busqu\w*|procur\w*|internet|site|p[áa]gina|"
+    r"weather|price|news|today|current|latest|search)\b",
+    re.IGNORECASE,
+)
+# Ferramentas cujo uso exige as instruções de navegação web
+WEB_TOOL_NAMES = frozenset({"web_search", "browser_use", "fetch_page"})
+# Ferramentas sem efeitos colaterais: só execuções que usaram apenas estas entram no cache
+# semântico (reaproveitar a resposta de quem salvou arquivos ou rodou comandos pularia o efeito)
+READ_ONLY_TOOL_NAMES = frozenset({"web_search", "browser_use", "fetch_page", "batch", "terminate", "create_chat_completion"})
+
+
+def needs_web(text: str) -> bool:
+    """Classificação barata (por palavras-chave) de tarefas que precisam da internet"""
+    return bool(text) and WEB_QUERY_PATTERN.search(text) is not None
 
 
 class Manus(ToolCallAgent):
@@ -47,6 +78,16 @@ class Manus(ToolCallAgent):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Variante compacta do prompt de sistema, se configurada (e não passada explicitamente)
+        if "system_prompt" not in kwargs and config.agent_config and config.agent_config.prompt_style == "compact":
+            self.system_prompt = SYSTEM_PROMPT_COMPACT
+        # fetch_page compartilha o navegador da ferramenta browser_use
+        browser_tool = self.available_tools.get_tool("browser_use")
+        if browser_tool and "fetch_page" not in self.available_tools.tool_map:
+            self.available_tools.add_tool(FetchPageTool(browser=browser_tool))
+        # Ferramenta de batch despacha as chamadas para as próprias ferramentas do agente
+        if "batch" not in self.available_tools.tool_map:
+            self.available_tools.add_tool(BatchTool(tools=self.available_tools))
         self.has_plan = False
         self.plan = []
         self.current_main_step = 0
@@ -59,6 +100,10 @@ class Manus(ToolCallAgent):
         self.asking_input_count = 0
         # Inicializar o manipulador de fallback de URL
         self.url_handler = URLFallbackHandler()
+        # Respostas finais de tarefas anteriores, reaproveitadas para tarefas equivalentes
+        # (desativado sem um embedding_model explícito no config.toml)
+        llm_settings = config.llm.get("default")
+        self.answer_cache = SemanticCache() if llm_settings and llm_settings.embedding_model else None
         # Armazenar o prompt original para acesso posterior
         self.original_user_prompt = ""
 
@@ -76,8 +121,8 @@ class Manus(ToolCallAgent):
         try:
             # Carregar configurações manualmente do arquivo config.toml
             config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "config", "config.toml")
-            with open(config_path, "r", encoding="utf-8") as f:
-                config_data = toml.load(f)
+            with open(config_path, "rb") as f:
+                config_data = tomllib.load(f)
             
             # Obter configurações do LLM
             llm_config = config_data.get("llm", {})
@@ -187,6 +232,32 @@ class Manus(ToolCallAgent):
             }
         
     async def run(self, prompt: str) -> str:
+        """Execute the agent's main loop, answering equivalent earlier tasks from the semantic cache"""
+        # Cache ativo apenas com um modelo de embeddings configurado explicitamente (embeddings
+        # do modelo de chat são ruins para similaridade); tarefas sobre dados que mudam com o
+        # tempo sempre são executadas
+        embedding = None
+        if self.answer_cache is not None and not is_time_sensitive(prompt):
+            embedding = await self.llm.embed(prompt)
+            if embedding is not None:
+                cached_answer = self.answer_cache.get(embedding)
+                if cached_answer is not None:
+                    return cached_answer
+
+        self.used_tools = set()
+        result = await self._run_task(prompt)
+
+        # Guardar apenas respostas de execuções sem falhas e só com ferramentas de leitura
+        if (
+            embedding is not None
+            and result
+            and not self.failed_tools
+            and self.used_tools <= READ_ONLY_TOOL_NAMES
+        ):
+            self.answer_cache.put(embedding, result)
+        return result
+
+    async def _run_task(self, prompt: str) -> str:
         """Execute the agent's main loop with intelligent task analysis"""
         # Armazenar o prompt original para uso posterior
         self.original_user_prompt = prompt
@@ -227,6 +298,16 @@ class Manus(ToolCallAgent):
         required_tools = analysis.get("required_tools", [])
         complexity = analysis.get("complexity", "moderada")
         
+        # Instruções de navegação web só quando a tarefa (ou a análise) indicar uso da internet
+        uses_web = needs_web(prompt) or any(
+            isinstance(tool, str) and tool in WEB_TOOL_NAMES for tool in required_tools or ()
+        )
+        # Ferramentas web ficam de fora do prompt quando a tarefa não precisa da internet
+        enabled_tools = tuple(sorted(
+            name for name in self.available_tools.tool_map if uses_web or name not in WEB_TOOL_NAMES
+        ))
+        self.next_step_prompt = render_next_step(enabled_tools)
+        
         # Exibir o plano somente se o LLM determinou que é necessário
         if analysis.get("needs_plan", True):
             print("\n## Plano de execução:")
@@ -242,6 +323,8 @@ class Manus(ToolCallAgent):
         logger.info(f"Complexidade detectada: {complexity}")
         logger.info(f"Ferramentas sugeridas: {', '.join(required_tools) if required_tools else 'nenhuma específica'}")
         logger.info(f"Passos planejados: {len(self.plan)}")
+        # Permite correlacionar quedas no reaproveitamento do cache com mudanças nos prompts
+        logger.debug(f"Versão dos prompts fixos: {PROMPT_SHA}")
             
         # Construir instrução para o modelo com base na análise
         if analysis.get("needs_plan") is False:
@@ -507,6 +590,18 @@ class Manus(ToolCallAgent):
                                 self.memory.add_message(Message.system_message(url_message))
                                 logger.info(f"Adicionada mensagem de sistema com URLs e instrução para navegação")
         
+        # fetch_page navega e extrai em uma única chamada: registrar a URL e tratar falhas de extração
+        elif name.lower() == 'fetch_page':
+            args = kwargs.get('args') if isinstance(kwargs.get('args'), dict) else {}
+            if args.get('url'):
+                self.url_handler.record_navigation_attempt(args['url'])
+            error = kwargs.get('error')
+            if isinstance(error, str) and ('HTML_EXTRACTION_ERROR' in error or 'extração' in error.lower()):
+                logger.warning("Detectado erro na extração da página. Tentando URL alternativa.")
+                error_message = self.url_handler.handle_html_extraction_error()
+                if error_message:
+                    self.memory.add_message(Message.system_message(error_message))
+        
         # Se for browser_use com erro de HTML, sugerir tentar URL alternativa
         elif name.lower() == 'browser_use':
             # Verificar se é uma operação de navegação para registrar
@@ -1,7 +1,8 @@
 import json
 import re
 import time
-from typing import Any, List, Literal, Optional, Union
+from types import MappingProxyType
+from typing import Any, List, Literal, Optional, Set, Tuple, Union
 import logging
 
 logging.basicConfig(level=logging.DEBUG)
@@ -9,6 +10,7 @@ logging.basicConfig(level=logging.DEBUG)
 from pydantic import Field
 
 from app.agent.react import ReActAgent
+from app.llm import BROWSER_ACTIONS
 from app.logger import logger
 from app.prompt.toolcall import NEXT_STEP_PROMPT, SYSTEM_PROMPT
 from app.schema import AgentState, Message, ToolCall, TOOL_CHOICE_TYPE, ToolChoice
@@ -17,6 +19,17 @@ from app.tool import CreateChatCompletion, Terminate, ToolCollection
 
 TOOL_CALL_REQUIRED = "Tool calls required but none provided"
 
+# Marcadores de erro conhecidos na saída das ferramentas (uma única varredura, sem lower())
+TOOL_ERROR_PATTERN = re.compile(r"error:|unknown action:|failed|not supported", re.IGNORECASE)
+
+# Query placeholder que o modelo costuma copiar dos exemplos do prompt
+PLACEHOLDER_QUERY = "sua consulta aqui"
+# Verbos de busca removidos do prompt do usuário ao montar a query do web_search
+SEARCH_VERB_PATTERN = re.compile(r"(?:busque|procure|pesquise) ")
+
+# Argumentos padrão (imutáveis) para executar terminate quando a chamada original falha
+TERMINATE_DEFAULT_ARGS = MappingProxyType({"status": "completed"})
+
 
 class ToolCallAgent(ReActAgent):
     """Base agent class for handling tool/function calls with enhanced abstraction"""
@@ -35,6 +48,8 @@ class ToolCallAgent(ReActAgent):
 
     tool_calls: List[Any] = Field(default_factory=list)
     recent_tool_calls: List[dict] = Field(default_factory=list)
+    # Nomes das ferramentas executadas (inclusive as chamadas dentro de um batch)
+    used_tools: Set[str] = Field(default_factory=set)
 
     max_steps: int = 30
     max_observe: Optional[Union[int, bool]] = None
@@ -58,6 +73,11 @@ class ToolCallAgent(ReActAgent):
         self.max_repeats = 2
         self.loop_detection_enabled = True
 
+        # Nomes das ferramentas especiais já normalizados para busca O(1)
+        self._special_tool_names_lower = frozenset(
+            n.lower() for n in self.special_tool_names
+        )
+
     def extract_tool_calls_from_text(self, text: str) -> List[dict]:
         """Extrai chamadas de ferramentas do texto da resposta"""
         tool_calls = []
@@ -78,7 +98,7 @@ class ToolCallAgent(ReActAgent):
         ]
         
         # Verificar padrão específico para o erro comum "sua consulta aqui"
-        if '"web_search"' in text and '"sua consulta aqui"' in text:
+        if '"web_search"' in text and f'"{PLACEHOLDER_QUERY}"' in text:
             # Substituir pelo prompt do usuário se for um placeholder
             prompt_text = self.memory.get_user_prompt() if hasattr(self, 'memory') else "últimas notícias sobre elon musk"
             if prompt_text:
@@ -91,7 +111,7 @@ class ToolCallAgent(ReActAgent):
                     }
                 }
                 tool_calls.append(tool_call)
-                logger.info(f"Substituiu 'sua consulta aqui' pelo prompt do usuário: {prompt_text}")
+                logger.info("Substituiu 'sua consulta aqui' pelo prompt do usuário: {}", prompt_text)
                 return tool_calls
         
         # Processar padrões normais        
@@ -106,7 +126,7 @@ class ToolCallAgent(ReActAgent):
                 else:
                     query = match
                     
-                if query and query != "sua consulta aqui":  # Verificar que não é placeholder
+                if query and query != PLACEHOLDER_QUERY:  # Verificar que não é placeholder
                     tool_call = {
                         "id": f"call_{hash(query) % 10000}",
                         "type": "function",
@@ -116,7 +136,7 @@ class ToolCallAgent(ReActAgent):
                         }
                     }
                     tool_calls.append(tool_call)
-                    logger.info(f"Extraído web_search para query: {query}")
+                    logger.info("Extraído web_search para query: {}", query)
         
         # NOVO: Detectar padrões para browser_use
         browser_patterns = [
@@ -130,10 +150,10 @@ class ToolCallAgent(ReActAgent):
             matches_found = re.findall(pattern, text, re.DOTALL)
             for match in matches_found:
                 # Determinar qual é a ação e qual é a URL
-                if match[0] in ["navigate", "get_text", "get_html", "click"]:
+                if match[0] in BROWSER_ACTIONS:
                     action, url = match[0], match[1]
                 else:
-                    url, action = match[0], match[1] if len(match) > 1 and match[1] in ["navigate", "get_text", "get_html", "click"] else "navigate"
+                    url, action = match[0], match[1] if len(match) > 1 and match[1] in BROWSER_ACTIONS else "navigate"
                 
                 if url:
                     tool_call = {
@@ -145,7 +165,7 @@ class ToolCallAgent(ReActAgent):
                         }
                     }
                     tool_calls.append(tool_call)
-                    logger.info(f"Extraído browser_use para action: {action}, url: {url}")
+                    logger.info("Extraído browser_use para action: {}, url: {}", action, url)
                     
         # Se já encontramos chamadas de ferramenta nos padrões Python, retornamos
         if tool_calls:
@@ -165,7 +185,7 @@ class ToolCallAgent(ReActAgent):
                 }
             }
             tool_calls.append(tool_call)
-            logger.info(f"Encontrado e corrigido padrão web_search especial: {query}")
+            logger.info("Encontrado e corrigido padrão web_search especial: {}", query)
             
         # Procurar por chamadas JSON em blocos de código
         json_pattern = r"```(?:json|tool|tool_code|python)?\s*({[\s\S]*?})\s*```"
@@ -246,7 +266,7 @@ class ToolCallAgent(ReActAgent):
                         }
                         tool_calls.append(tool_call)
             except Exception as e:
-                logger.warning(f"Erro ao processar JSON: {e}")
+                logger.warning("Erro ao processar JSON: {}", e)
                 
         # Verificar se há comandos diretos para terminar após processar JSON
         termination_phrases = ["pare", "termine", "stop", "exit", "encerre", "finalizar", "concluir"]
@@ -287,7 +307,7 @@ class ToolCallAgent(ReActAgent):
         if response.content:
             should_terminate = any(re.search(r'\b' + re.escape(phrase) + r'\b', response.content.lower()) for phrase in termination_phrases)
             if should_terminate:
-                logger.info(f"Detected termination phrase in response: {response.content[:50]}...")
+                logger.info("Detected termination phrase in response: {}...", response.content[:50])
         
         # NOVO: Detectar padrões específicos para web_search em código Python ou exemplos 
         # que frequentemente aparecem em resposas do Ollama
@@ -322,7 +342,7 @@ class ToolCallAgent(ReActAgent):
                             if not response.tool_calls:
                                 response.tool_calls = []
                             response.tool_calls.append(tool_call)
-                            logger.info(f"Criada chamada de web_search para: últimas notícias sobre elon musk")
+                            logger.info("Criada chamada de web_search para: últimas notícias sobre elon musk")
                             break
             
         # Check for tool calls in response text if none are present in the response object
@@ -331,7 +351,7 @@ class ToolCallAgent(ReActAgent):
             extracted_tool_calls = self.extract_tool_calls_from_text(response.content)
             if extracted_tool_calls:
                 response.tool_calls = extracted_tool_calls
-                logger.info(f"Extracted {len(extracted_tool_calls)} tool calls from text")
+                logger.info("Extracted {} tool calls from text", len(extracted_tool_calls))
         
         # NOVO: Tratamento específico para o caso "buscar notícias sobre Elon Musk"
         # Se chegamos até aqui sem tool calls e "elon musk" aparece no contexto
@@ -347,7 +367,7 @@ class ToolCallAgent(ReActAgent):
             if not response.tool_calls:
                 response.tool_calls = []
             response.tool_calls.append(tool_call)
-            logger.info(f"Criada chamada de web_search para query default: últimas notícias sobre elon musk")
+            logger.info("Criada chamada de web_search para query default: últimas notícias sobre elon musk")
                 
         # If no tool calls were found but termination was detected, add terminate tool
         if should_terminate and (not response.tool_calls or not any("terminate" in str(tool).lower() for tool in response.tool_calls)):
@@ -367,10 +387,8 @@ class ToolCallAgent(ReActAgent):
         self.tool_calls = response.tool_calls if response.tool_calls else []
 
         # Log response info
-        logger.info(f"✨ {self.name}'s thoughts: {response.content}")
-        logger.info(
-            f"🛠️ {self.name} selected {len(self.tool_calls)} tools to use"
-        )
+        logger.info("✨ {}'s thoughts: {}", self.name, response.content)
+        logger.info("🛠️ {} selected {} tools to use", self.name, len(self.tool_calls))
         
         if self.tool_calls:
             # Get tool names for logging
@@ -383,7 +401,7 @@ class ToolCallAgent(ReActAgent):
                 else:
                     tool_names.append('unknown')
                     
-            logger.info(f"🧰 Tools being prepared: {tool_names}")
+            logger.info("🧰 Tools being prepared: {}", tool_names)
 
         try:
             # Handle different tool_choices modes
@@ -423,7 +441,7 @@ class ToolCallAgent(ReActAgent):
 
             return bool(self.tool_calls)
         except Exception as e:
-            logger.error(f"🚨 Oops! The {self.name}'s thinking process hit a snag: {e}")
+            logger.error("🚨 Oops! The {}'s thinking process hit a snag: {}", self.name, e)
             self.memory.add_message(
                 Message.assistant_message(
                     f"Error encountered while processing: {str(e)}"
@@ -462,7 +480,7 @@ class ToolCallAgent(ReActAgent):
                                 args = json.loads(command['function']['arguments'])
                                 if isinstance(args, dict) and 'message' in args and args['message'] and len(args['message'].strip()) > 0:
                                     user_friendly_response = args['message'].strip()
-                                    logger.info(f"Extracted message from terminate: {user_friendly_response}")
+                                    logger.info("Extracted message from terminate: {}", user_friendly_response)
                             except json.JSONDecodeError:
                                 pass
                 elif hasattr(command, 'function') and hasattr(command.function, 'name'):
@@ -478,7 +496,7 @@ class ToolCallAgent(ReActAgent):
                 # Se as últimas 3 ações foram idênticas e não é terminate
                 if len(tool_history) >= 3 and tool_history[-1] == tool_history[-2] == tool_history[-3] and tool_name != 'terminate':
                     # Forçar terminação por loop
-                    logger.warning(f"Detectado loop com a ferramenta: {tool_name}. Finalizando execução.")
+                    logger.warning("Detectado loop com a ferramenta: {}. Finalizando execução.", tool_name)
                     terminate_result = "Tarefa interrompida devido a ações repetitivas. Tente com um prompt mais claro."
                     
                     # Definir resposta amigável para o usuário
@@ -504,7 +522,7 @@ class ToolCallAgent(ReActAgent):
                             'error': result
                         })
                         
-                    logger.warning(f"Tool '{tool_name}' failed. Error: {result}")
+                    logger.warning("Tool '{}' failed. Error: {}", tool_name, result)
                     # Adicionar uma mensagem especial para o modelo saber que houve falha
                     if hasattr(self, 'memory'):
                         self.memory.add_message(Message.system_message(
@@ -517,9 +535,9 @@ class ToolCallAgent(ReActAgent):
                     if isinstance(result, str) and len(result.strip()) > 0:
                         # Usar o resultado diretamente como resposta final
                         user_friendly_response = result.strip()
-                        logger.info(f"Using terminate result as response: {user_friendly_response[:50]}...")
+                        logger.info("Using terminate result as response: {}...", user_friendly_response[:50])
                     
-                logger.info(f"🎯 Tool '{tool_name}' completed: {result[:80]}{'...' if len(result) > 80 else ''}")
+                logger.info("🎯 Tool '{}' completed: {}{}", tool_name, result[:80], '...' if len(result) > 80 else '')
 
                 # Add tool response to memory
                 tool_msg = Message.tool_message(
@@ -571,7 +589,7 @@ class ToolCallAgent(ReActAgent):
             tuple: (result_str, success_flag)
         """
         # Log para depuração
-        logger.info(f"Executando ferramenta: {command}")
+        logger.debug("Executando ferramenta: {}", command)
         
         # Extrair args para passar para _handle_special_tool mais tarde
         tool_args = None
@@ -586,13 +604,6 @@ class ToolCallAgent(ReActAgent):
                 
             name = function['name']
             arguments = function.get('arguments', '{}')
-            
-            # Verificar se é web_search com argumento placeholder
-            if name == 'web_search' and '"sua consulta aqui"' in arguments:
-                # Melhorar o prompt para web_search (remover verbos como "busque")
-                clean_query = self._user_prompt.replace("busque ", "").replace("procure ", "").replace("pesquise ", "")
-                arguments = json.dumps({"query": clean_query})
-                logger.info(f"Substituindo 'sua consulta aqui' por '{clean_query}'")
                 
         # Handle ToolCall object format (from OpenAI)
         else:
@@ -602,33 +613,27 @@ class ToolCallAgent(ReActAgent):
             name = command.function.name
             arguments = command.function.arguments or "{}"
             
-            # Verificar se é web_search com argumento placeholder
-            if name == 'web_search' and '"sua consulta aqui"' in arguments:
-                # Melhorar o prompt para web_search (remover verbos como "busque")
-                clean_query = self._user_prompt.replace("busque ", "").replace("procure ", "").replace("pesquise ", "")
-                arguments = json.dumps({"query": clean_query})
-                logger.info(f"Substituindo 'sua consulta aqui' por '{clean_query}'")
-            
+        # Ferramenta desconhecida: retornar antes de qualquer tratamento dos argumentos
         if name not in self.available_tools.tool_map:
             return (f"Error: Unknown tool '{name}'", False)
 
         try:
             # Parse arguments (handling both string and dict formats)
             if isinstance(arguments, str):
-                try:
-                    args = json.loads(arguments)
-                except json.JSONDecodeError:
-                    # Se não conseguir analisar como JSON, tentar usar como string direta
+                # Só tentar o parse quando a string pode ser JSON, evitando a exceção
+                if arguments.lstrip()[:1] in ("{", "["):
+                    try:
+                        args = json.loads(arguments)
+                    except json.JSONDecodeError:
+                        # Se não conseguir analisar como JSON, tentar usar como string direta
+                        args = {"text": arguments}
+                else:
                     args = {"text": arguments}
             else:
                 args = arguments
             
-            # Verificação adicional após parsing para substituir "sua consulta aqui"
-            if name == 'web_search' and 'query' in args and args['query'] == 'sua consulta aqui':
-                # Melhorar o prompt para web_search (remover verbos como "busque")
-                clean_query = self._user_prompt.replace("busque ", "").replace("procure ", "").replace("pesquise ", "")
-                args['query'] = clean_query
-                logger.info(f"Substituindo 'sua consulta aqui' por '{clean_query}'")
+            # Substituir o placeholder "sua consulta aqui" pelo prompt do usuário
+            self._maybe_clean_query(name, args)
                 
             # Armazenar args para passar para _handle_special_tool
             tool_args = args
@@ -643,29 +648,36 @@ class ToolCallAgent(ReActAgent):
                 if args and not isinstance(args, dict):
                     args = {"status": "completed"}
 
+            self.used_tools.add(name)
+            if name == "batch" and isinstance(args, dict):
+                self.used_tools.update(
+                    invocation.get("tool_name") for invocation in args.get("invocations") or []
+                    if isinstance(invocation, dict) and invocation.get("tool_name")
+                )
+
             # Execute the tool
-            logger.info(f"🔧 Activating tool: '{name}'...")
+            logger.info("🔧 Activating tool: '{}'...", name)
             result = await self.available_tools.execute(name=name, tool_input=args)
             
             # Verificar se o resultado contém erros conhecidos
             is_success = True
             error_msg = None
             
-            if isinstance(result, str) and any(error in result.lower() for error in ["error:", "unknown action:", "failed", "not supported"]):
+            if isinstance(result, str) and TOOL_ERROR_PATTERN.search(result):
                 is_success = False
                 error_msg = result
-                logger.warning(f"Tool execution failed: {result}")
+                logger.warning("Tool execution failed: {}", result)
             elif hasattr(result, 'error') and result.error:
                 is_success = False
                 error_msg = result.error
-                logger.warning(f"Tool execution failed with error: {result.error}")
+                logger.warning("Tool execution failed with error: {}", result.error)
             
             # Caso especial para a ferramenta terminate
             if name.lower() == "terminate":
                 # Não mostrar a saída da ferramenta terminate para o usuário
                 status = args.get('status', 'completed')
                 message = args.get('message', '')
-                logger.info(f"Terminate tool executed with status: {status} and message: {message}")
+                logger.info("Terminate tool executed with status: {} and message: {}", status, message)
                 if message:
                     observation = f"Task completed. {message}"
                 else:
@@ -693,16 +705,12 @@ class ToolCallAgent(ReActAgent):
             else:
                 args_display = command.function.arguments if hasattr(command, 'function') else '{}'
                 
-            logger.error(f"📝 Oops! The arguments for '{name}' don't make sense - invalid JSON, arguments:{args_display}")
+            logger.error("📝 Oops! The arguments for '{}' don't make sense - invalid JSON, arguments:{}", name, args_display)
             
             # Para terminate, tente executar mesmo assim com argumentos padrão
-            if name.lower() == "terminate":
-                try:
-                    result = await self.available_tools.execute(name=name, tool_input={"status": "completed"})
-                    await self._handle_special_tool(name=name, result=result)
-                    return ("Task completed.", True)
-                except Exception:
-                    pass
+            fallback = await self._terminate_fallback(name)
+            if fallback:
+                return fallback
                     
             return (f"Error: {error_msg}", False)
         except Exception as e:
@@ -710,28 +718,39 @@ class ToolCallAgent(ReActAgent):
             logger.error(error_msg)
             
             # Para terminate, tente executar mesmo assim com argumentos padrão
-            if name.lower() == "terminate":
-                try:
-                    result = await self.available_tools.execute(name=name, tool_input={"status": "completed"})
-                    await self._handle_special_tool(name=name, result=result)
-                    return ("Task completed.", True)
-                except Exception:
-                    pass
+            fallback = await self._terminate_fallback(name)
+            if fallback:
+                return fallback
                     
             return (f"Error: {error_msg}", False)
 
+    def _maybe_clean_query(self, name: str, args: Any) -> None:
+        """Troca a query placeholder do web_search pelo prompt do usuário sem verbos de busca"""
+        if name == "web_search" and isinstance(args, dict) and args.get("query") == PLACEHOLDER_QUERY:
+            clean_query = SEARCH_VERB_PATTERN.sub("", self._user_prompt)
+            args["query"] = clean_query
+            logger.info("Substituindo '{}' por '{}'", PLACEHOLDER_QUERY, clean_query)
+
+    async def _terminate_fallback(self, name: str) -> Optional[Tuple[str, bool]]:
+        """Executa terminate com argumentos padrão após falha ao processar a chamada original"""
+        if name.lower() != "terminate":
+            return None
+        try:
+            result = await self.available_tools.execute(name=name, tool_input=dict(TERMINATE_DEFAULT_ARGS))
+            await self._handle_special_tool(name=name, result=result)
+            return ("Task completed.", True)
+        except Exception:
+            return None
+
     async def _handle_special_tool(self, name: str, result: Any, **kwargs):
         """Handle special tool execution and state changes"""
-        # Caso o nome esteja vazio ou seja None, não fazer nada
-        if not name:
-            return
-            
-        if not self._is_special_tool(name):
+        # Caso o nome esteja vazio, seja None ou não seja especial, não fazer nada
+        if not name or name.lower() not in self._special_tool_names_lower:
             return
 
         if self._should_finish_execution(name=name, result=result, **kwargs):
             # Set agent state to finished
-            logger.info(f"🏁 Special tool '{name}' has completed the task!")
+            logger.info("🏁 Special tool '{}' has completed the task!", name)
             self.state = AgentState.FINISHED
 
     @staticmethod
@@ -741,4 +760,4 @@ class ToolCallAgent(ReActAgent):
 
     def _is_special_tool(self, name: str) -> bool:
         """Check if tool name is in special tools list"""
-        return name.lower() in [n.lower() for n in self.special_tool_names]
+        return name.lower() in self._special_tool_names_lower
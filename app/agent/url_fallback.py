@@ -3,11 +3,44 @@ Módulo para tratamento de fallback de URLs quando uma URL falha durante a naveg
 ou extração de HTML no projeto OpenManus.
 """
 
-from typing import List, Optional
+from collections import Counter
+from typing import List, Optional, Tuple
 import ast
+import json
 import re
 from app.logger import logger
 
+# Padrão para encontrar URLs em texto
+URL_PATTERN = re.compile(r'https?://[^\s\'"]+\.[^\s\'"]+(?=/|$)')
+# Pontuação que pode ficar presa ao final de uma URL
+URL_TRAILING_PUNCTUATION = ",.;:"
+
+# Mensagem enviada ao modelo quando a extração de HTML falha e há URL alternativa
+HTML_EXTRACTION_ERROR_TEMPLATE = """
+            ERRO: Falha ao extrair conteúdo da página atual.
+            
+            SUGESTÃO: Tente navegar para esta URL alternativa: {url}
+            
+            Exemplo de código para executar:
+            ```json
+            {{
+              "function": {{
+                "name": "browser_use",
+                "arguments": {{
+                  "action": "navigate",
+                  "url": "{url}"
+                }}
+              }}
+            }}
+            ```
+            """
+
+# Mensagem enviada ao modelo quando todas as URLs já foram tentadas
+NO_ALTERNATIVE_URLS_MESSAGE = """
+            ERRO: Todas as URLs disponíveis já foram tentadas sem sucesso.
+            Recomende ao usuário pesquisar por termos mais específicos ou use outra abordagem.
+            """
+
 class URLFallbackHandler:
     """
     Classe que implementa o mecanismo de fallback para URLs alternativas
@@ -15,10 +48,30 @@ class URLFallbackHandler:
     """
     
     def __init__(self):
-        # Lista de URLs já tentadas
-        self.tried_urls: List[str] = []
+        # URLs já tentadas (em ordem de tentativa) com o número de tentativas de cada uma
+        self._tried_count: Counter = Counter()
         # Lista de URLs disponíveis dos resultados de busca
-        self.available_urls: List[str] = []
+        self._available_urls: List[str] = []
+        # Posição da próxima URL candidata em available_urls
+        self._next_idx: int = 0
+        # Assinatura (tamanho, hash) do último resultado de busca processado com sucesso
+        self._last_result_key: Optional[Tuple[int, int]] = None
+
+    @property
+    def tried_urls(self) -> List[str]:
+        """URLs já tentadas, na ordem em que foram registradas."""
+        return list(self._tried_count)
+
+    @property
+    def available_urls(self) -> List[str]:
+        """URLs disponíveis dos resultados de busca."""
+        return self._available_urls
+
+    @available_urls.setter
+    def available_urls(self, urls: List[str]) -> None:
+        # Uma nova lista de URLs reinicia a busca pela próxima URL candidata
+        self._available_urls = urls
+        self._next_idx = 0
     
     def process_web_search_result(self, result: str) -> None:
         """
@@ -29,47 +82,52 @@ class URLFallbackHandler:
         """
         if not result:
             return
+
+        # Evitar reprocessar exatamente o mesmo resultado de busca
+        result_key = (len(result), hash(result))
+        if result_key == self._last_result_key:
+            return
             
         # Limpar a lista apenas se encontrarmos novas URLs
         urls_found = False
             
         # Verificar se a resposta parece uma lista de URLs
-        if result.startswith('[') and ']' in result and 'http' in result:
+        if result[:1] == '[' and 'http' in result:
+            # Tentar primeiro como JSON (parser em C) e só então como lista literal Python
             try:
-                # Tentar avaliar como lista literal Python
-                url_list = ast.literal_eval(result)
-                if isinstance(url_list, list):
-                    # Filtrar apenas itens que parecem URLs
-                    new_urls = [url for url in url_list if isinstance(url, str) and url.startswith('http')]
-                    if new_urls:
-                        self.available_urls = new_urls
-                        urls_found = True
-                        logger.info(f"Armazenadas {len(self.available_urls)} URLs dos resultados de busca")
-            except Exception as e:
-                logger.warning(f"Erro ao processar lista de URLs via ast: {e}")
+                url_list = json.loads(result)
+            except ValueError:
+                try:
+                    url_list = ast.literal_eval(result)
+                except Exception as e:
+                    logger.warning("Erro ao processar lista de URLs via ast: {}", e)
+                    url_list = None
+            if isinstance(url_list, list):
+                # Filtrar apenas itens que parecem URLs
+                new_urls = [url for url in url_list if isinstance(url, str) and url.startswith('http')]
+                if new_urls:
+                    self.available_urls = new_urls
+                    urls_found = True
+                    self._last_result_key = result_key
+                    logger.info("Armazenadas {} URLs dos resultados de busca", len(self.available_urls))
                 
         # Se não encontrou via ast.literal_eval, tentar regex
         if not urls_found:
-            try:
-                # Padrão para encontrar URLs em texto
-                url_pattern = r'https?://[^\s\'"]+\.[^\s\'"]+(?=/|$)'
-                found_urls = re.findall(url_pattern, result)
-                
-                if found_urls:
-                    # Filtrar URLs únicas e válidas
-                    new_urls = []
-                    for url in found_urls:
-                        # Limpar a URL removendo possíveis caracteres no final
-                        clean_url = re.sub(r'[,.;:]$', '', url)
-                        if clean_url not in new_urls:
-                            new_urls.append(clean_url)
-                    
-                    if new_urls:
-                        self.available_urls = new_urls
-                        urls_found = True
-                        logger.info(f"Armazenadas {len(self.available_urls)} URLs dos resultados de busca via regex")
-            except Exception as e:
-                logger.warning(f"Erro ao processar lista de URLs via regex: {e}")
+            # Filtrar URLs únicas preservando a ordem, em uma única passada
+            seen_urls = set()
+            new_urls = []
+            for match in URL_PATTERN.finditer(result):
+                # Limpar possíveis caracteres no final da URL
+                clean_url = match.group(0).rstrip(URL_TRAILING_PUNCTUATION)
+                if clean_url not in seen_urls:
+                    seen_urls.add(clean_url)
+                    new_urls.append(clean_url)
+            
+            if new_urls:
+                self.available_urls = new_urls
+                urls_found = True
+                self._last_result_key = result_key
+                logger.info("Armazenadas {} URLs dos resultados de busca via regex", len(self.available_urls))
     
     def record_navigation_attempt(self, url: str) -> None:
         """
@@ -78,9 +136,11 @@ class URLFallbackHandler:
         Args:
             url: URL que foi tentada
         """
-        if url and url not in self.tried_urls and isinstance(url, str):
-            self.tried_urls.append(url)
-            logger.info(f"Registrada tentativa de navegação para: {url}")
+        if url and isinstance(url, str):
+            is_new = url not in self._tried_count
+            self._tried_count[url] += 1
+            if is_new:
+                logger.info("Registrada tentativa de navegação para: {}", url)
     
     def get_next_url(self) -> Optional[str]:
         """
@@ -89,16 +149,15 @@ class URLFallbackHandler:
         Returns:
             URL não tentada ou None se todas já foram tentadas
         """
-        # Filtrar URLs que ainda não foram tentadas
-        untried_urls = [url for url in self.available_urls if url not in self.tried_urls]
-        
-        # Se houver URLs não tentadas, retornar a primeira
-        if untried_urls:
-            next_url = untried_urls[0]
-            # Adicionar à lista de URLs tentadas
-            self.tried_urls.append(next_url)
-            logger.info(f"URL alternativa sugerida: {next_url}")
-            return next_url
+        # Avançar a partir da última posição, pulando URLs que já foram tentadas
+        while self._next_idx < len(self._available_urls):
+            next_url = self._available_urls[self._next_idx]
+            self._next_idx += 1
+            if next_url not in self._tried_count:
+                # Adicionar às URLs tentadas
+                self._tried_count[next_url] += 1
+                logger.info("URL alternativa sugerida: {}", next_url)
+                return next_url
         
         logger.warning("Sem URLs alternativas disponíveis.")
         return None
@@ -113,32 +172,11 @@ class URLFallbackHandler:
         """
         next_url = self.get_next_url()
         if next_url:
-            logger.info(f"Sugerindo URL alternativa após erro de HTML: {next_url}")
+            logger.info("Sugerindo URL alternativa após erro de HTML: {}", next_url)
             # Criar mensagem de erro com sugestão
-            error_message = f"""
-            ERRO: Falha ao extrair conteúdo da página atual.
-            
-            SUGESTÃO: Tente navegar para esta URL alternativa: {next_url}
-            
-            Exemplo de código para executar:
-            ```json
-            {{
-              "function": {{
-                "name": "browser_use",
-                "arguments": {{
-                  "action": "navigate",
-                  "url": "{next_url}"
-                }}
-              }}
-            }}
-            ```
-            """
-            return error_message
+            return HTML_EXTRACTION_ERROR_TEMPLATE.format(url=next_url)
         else:
-            return """
-            ERRO: Todas as URLs disponíveis já foram tentadas sem sucesso.
-            Recomende ao usuário pesquisar por termos mais específicos ou use outra abordagem.
-            """
+            return NO_ALTERNATIVE_URLS_MESSAGE
     
     def detect_navigation_loop(self, url: str) -> bool:
         """
@@ -151,7 +189,7 @@ class URLFallbackHandler:
             True se for detectado um loop, False caso contrário
         """
         # Verifica se a URL já foi tentada mais de uma vez
-        if url in self.tried_urls and self.tried_urls.count(url) > 1:
-            logger.warning(f"Detectado loop de navegação para URL: {url}")
+        if self._tried_count[url] > 1:
+            logger.warning("Detectado loop de navegação para URL: {}", url)
             return True
         return False
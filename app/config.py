@@ -23,6 +23,8 @@ class LLMSettings(BaseModel):
     temperature: float = Field(1.0, description="Sampling temperature")
     api_type: str = Field(..., description="AzureOpenai or Openai or local")
     api_version: str = Field(..., description="API version if needed")
+    embedding_model: Optional[str] = Field(None, description="Modelo de embeddings; sem ele o cache semântico de respostas fica desativado")
+    keep_alive: str = Field("30m", description="Tempo que o Ollama mantém o modelo carregado entre chamadas")
     
     def model_post_init(self, __context):
         # Se api_type for local (Ollama) e api_key for None, definir um valor padrão
@@ -38,6 +40,9 @@ class ProxySettings(BaseModel):
 class SearchSettings(BaseModel):
     engine: str = Field(default='Google', description="Search engine the llm to use")
 
+class AgentSettings(BaseModel):
+    prompt_style: str = Field("verbose", description="Variante do prompt de sistema: verbose ou compact")
+
 class BrowserSettings(BaseModel):
     headless: bool = Field(False, description="Whether to run browser in headless mode")
     disable_security: bool = Field(
@@ -68,6 +73,9 @@ class AppConfig(BaseModel):
     search_config: Optional[SearchSettings] = Field(
         None, description="Search configuration"
     )
+    agent_config: Optional[AgentSettings] = Field(
+        None, description="Agent configuration"
+    )
 
     class Config:
         arbitrary_types_allowed = True
@@ -124,6 +132,8 @@ class Config:
             "temperature": base_llm.get("temperature", 1.0),
             "api_type": base_llm.get("api_type", ""),
             "api_version": base_llm.get("api_version", ""),
+            "embedding_model": base_llm.get("embedding_model"),
+            "keep_alive": base_llm.get("keep_alive", "30m"),
         }
 
         # handle browser config.
@@ -164,6 +174,9 @@ class Config:
         if search_config:
             search_settings = SearchSettings(**search_config)
 
+        agent_config = raw_config.get("agent", {})
+        agent_settings = AgentSettings(**agent_config) if agent_config else None
+
         config_dict = {
             "llm": {
                 "default": default_settings,
@@ -174,6 +187,7 @@ class Config:
             },
             "browser_config": browser_settings,
             "search_config": search_settings,
+            "agent_config": agent_settings,
         }
 
         self._config = AppConfig(**config_dict)
@@ -190,5 +204,9 @@ class Config:
     def search_config(self) -> Optional[SearchSettings]:
         return self._config.search_config
 
+    @property
+    def agent_config(self) -> Optional[AgentSettings]:
+        return self._config.agent_config
+
 
 config = Config()
@@ -1,45 +1,345 @@
 from typing import Dict, List, Optional, Union
 import json
 import asyncio
+import functools
+import io
 import aiohttp
-import toml
+import tomllib
 import os
 import re
+import sys
+import threading
+import time
 import uuid
-from tenacity import retry, stop_after_attempt, wait_random_exponential, RetryError
+from collections import deque
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential, RetryError
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele usamos o json da stdlib
+    orjson = None
 
 from app.config import LLMSettings, config
 from app.logger import logger
 from app.schema import Message, TOOL_CHOICE_TYPE, ROLE_VALUES, TOOL_CHOICE_VALUES, ToolChoice
 
 
+# Mensagem retornada quando não é possível conectar ao servidor Ollama
+OLLAMA_UNAVAILABLE_MESSAGE = "Não foi possível conectar ao Ollama. Verifique se o servidor está rodando."
+# Mensagem retornada quando o Ollama não responde dentro do tempo limite
+OLLAMA_TIMEOUT_MESSAGE = "O Ollama não respondeu a tempo. O modelo pode estar carregando ou o servidor está sobrecarregado."
+# Tempo (segundos) durante o qual o resultado de check_ollama_status é reaproveitado
+OLLAMA_STATUS_TTL = 5.0
+# Marcador que separa cada prompt (e sua resposta) quando agrupados em uma única requisição
+ROW_MARKER = "\n---ROW {index}---\n"
+ROW_MARKER_PATTERN = re.compile(r"\n?---ROW (\d+)---\n?")
+ROW_MARSHAL_INSTRUCTIONS = (
+    "Responda a cada item abaixo separadamente. Inicie cada resposta com o mesmo "
+    "marcador ---ROW n--- do item correspondente e não inclua outros marcadores.\n"
+)
+# Instruções de formato de chamada de ferramenta enviadas junto à lista de ferramentas
+TOOL_INSTRUCTIONS = """
+                Para utilizar uma ferramenta, responda neste formato:
+                ```json
+                {
+                  "tool_name": "NOME_DA_FERRAMENTA",
+                  "arguments": {
+                    "arg1": "valor1",
+                    "arg2": "valor2"
+                  }
+                }
+                ```
+                Se não for usar uma ferramenta, responda normalmente em texto.
+                """
+# Intervalo mínimo (segundos) entre flushes do stdout durante o streaming
+STREAM_FLUSH_INTERVAL = 0.05
+# Falhas determinísticas do Ollama: repetir a chamada só aumentaria a carga
+NON_RETRYABLE_ERROR_MARKERS = ("out of memory", "mem_buffer", "NULL")
+# Falhas consecutivas que abrem o circuit breaker e por quanto tempo (segundos)
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_COOLDOWN = 10.0
+# Telemetria de reaproveitamento do cache KV do Ollama: o Ollama só informa quantos tokens
+# do prompt foram avaliados (prompt_eval_count), então o total do prompt é estimado pelo tamanho
+APPROX_BYTES_PER_TOKEN = 4
+# Janela móvel de chamadas usada para a taxa de reaproveitamento e limite abaixo do qual avisar
+CACHE_RATIO_WINDOW = 20
+CACHE_RATIO_WARNING_THRESHOLD = 0.5
+# Padrão do Ollama é 5m; pausas maiores entre tarefas descarregariam o modelo
+DEFAULT_KEEP_ALIVE = "30m"
+
+# Fechamentos de sessão agendados por LLM.__del__: o loop só guarda referências fracas às
+# tasks, então elas ficam aqui até terminar para não serem coletadas no meio da execução
+_SESSION_CLOSE_TASKS: "set[asyncio.Task]" = set()
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Indica se vale a pena repetir uma chamada ao Ollama que falhou com este erro"""
+    if isinstance(error, (aiohttp.ServerTimeoutError, asyncio.TimeoutError)):
+        # Ollama lento (carregando o modelo ou sobrecarregado): vale tentar de novo
+        return True
+    if isinstance(error, aiohttp.ClientConnectorError):
+        # Servidor fora do ar (conexão recusada): falhar rápido em vez de esperar o backoff
+        return False
+    message = str(error)
+    return not any(marker in message for marker in NON_RETRYABLE_ERROR_MARKERS)
+
+
+# Formato de cada mensagem, por papel, no prompt enviado ao /api/generate
+PROMPT_ROLE_TEMPLATES = {
+    "system": "<s>{}</s>\n\n",
+    "user": "{}\n\n",
+    "assistant": "{}\n\n",
+    "tool": "<tool>{}</tool>\n\n",
+}
+
+if orjson is not None:
+    json_loads = orjson.loads
+
+    def json_dumps(obj) -> str:
+        """Serializa com orjson (que gera bytes) e decodifica uma única vez"""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+else:
+    json_loads = json.loads
+    json_dumps = json.dumps
+
+
+@functools.lru_cache(maxsize=128)
+def encode_prompt_segment(role: str, content: str) -> bytes:
+    """
+    Trecho do prompt de uma mensagem, escapado como conteúdo de string JSON e em UTF-8.
+
+    O escape JSON é feito caractere a caractere, então trechos escapados separadamente
+    podem ser concatenados. Mensagens que se repetem a cada turno (prompt de sistema,
+    descrição das ferramentas) são codificadas uma única vez.
+    """
+    return json_dumps(PROMPT_ROLE_TEMPLATES[role].format(content))[1:-1].encode("utf-8")
+
+
+# Padrões para detectar chamadas de web_search escritas como código Python
+WEB_SEARCH_PATTERNS = tuple(
+    re.compile(pattern, re.DOTALL)
+    for pattern in (
+        r'(?:function|name)\s*=\s*["\']web_search["\']\s*,\s*(?:arguments|args|params|query)\s*=\s*(?:{[^}]*"query"\s*:\s*"([^"]+)"[^}]*}|"([^"]+)")',
+        r'web_search\((?:[^)]*query=)?["\']([^"\']+)["\']',
+        r'"name"\s*:\s*"web_search".*?"query"\s*:\s*"([^"]+)"',
+        r'sua consulta aqui|elon musk',  # Valores de exemplo/placeholder comuns
+    )
+)
+
+# Padrões para detectar chamadas de browser_use escritas como código Python
+BROWSER_USE_PATTERNS = tuple(
+    re.compile(pattern, re.DOTALL)
+    for pattern in (
+        r'(?:function|name)\s*=\s*["\']browser_use["\']\s*,\s*(?:arguments|args|params)\s*=\s*{[^}]*"(?:action|url)"\s*:\s*"([^"]+)".*?"(?:action|url)"\s*:\s*"([^"]+)"',
+        r'browser_use\([^)]*(?:action=)?["\']([^"\']+)["\'][^)]*(?:url=)?["\']([^"\']+)["\']',
+    )
+)
+
+# Ações de browser_use reconhecidas nas chamadas escritas como código
+BROWSER_ACTIONS = frozenset({"navigate", "get_text", "get_html", "click"})
+# Domínios de exemplo que o modelo copia dos prompts e que não devem ser visitados
+FAKE_URLS = ("exemplo.com", "example.com")
+
+# JSON entre marcadores de código
+JSON_CODE_BLOCK_PATTERN = re.compile(r"```(?:json|tool|tool_code|python)?\s*({[\s\S]*?})\s*```")
+# Chaves que indicam que um JSON solto no texto é uma chamada de ferramenta
+TOOL_CALL_JSON_KEYS = ('"function"', '"name"', '"tool_name"', '"query"', '"action"', '"url"')
+# Trechos sem os quais extract_tool_call não encontra nenhuma chamada: todo caminho baseado
+# em JSON exige "{" e os padrões de código citam a ferramenta (ou o valor fixo "elon musk")
+TOOL_CALL_NEEDLES = ("{", "web_search", "browser_use", "elon musk")
+# Localização mencionada no texto ("em São Paulo") para a ferramenta get_weather
+LOCATION_PATTERN = re.compile(r'em\s+([^?\.!]+)')
+
+# Padrões de extract_tool_call, na ordem de prioridade original (compilados uma única vez)
+TOOL_CALL_SCAN_PATTERNS = {
+    **{f"web_search_{i}": pattern for i, pattern in enumerate(WEB_SEARCH_PATTERNS)},
+    **{f"browser_use_{i}": pattern for i, pattern in enumerate(BROWSER_USE_PATTERNS)},
+    "json_code_block": JSON_CODE_BLOCK_PATTERN,
+}
+
+
+def _json_object_ends(text: str) -> List[int]:
+    """
+    Para cada posição, onde termina o objeto se uma varredura nova começasse num "{" ali.
+
+    ends[i] é a posição logo após a chave que fecha o objeto aberto em i (-1 se não fechar),
+    com a mesma contagem de chaves fora de strings de uma varredura que partisse de i.
+    A tabela é montada da direita para a esquerda em tempo linear: a partir de cada posição
+    e estado (fora de string, em string, após "\\" em string) a varredura segue um caminho
+    fixo, então o fechamento de um objeto aninhado é reaproveitado por quem o contém.
+    """
+    n = len(text)
+    # Posição da chave que leva a profundidade relativa a -1, partindo de i em cada estado
+    closing_out = [-1] * (n + 1)
+    closing_in = [-1] * (n + 1)
+    closing_escaped = [-1] * (n + 1)
+    for i in range(n - 1, -1, -1):
+        char = text[i]
+        closing_escaped[i] = closing_in[i + 1]
+        if char == "\\":
+            closing_in[i] = closing_escaped[i + 1]
+        elif char == '"':
+            closing_in[i] = closing_out[i + 1]
+        else:
+            closing_in[i] = closing_in[i + 1]
+        if char == '"':
+            closing_out[i] = closing_in[i + 1]
+        elif char == "}":
+            closing_out[i] = i
+        elif char == "{":
+            nested = closing_out[i + 1]
+            closing_out[i] = -1 if nested < 0 else closing_out[nested + 1]
+        else:
+            closing_out[i] = closing_out[i + 1]
+    return [-1 if closing_out[i + 1] < 0 else closing_out[i + 1] + 1 for i in range(n)]
+
+
+def iter_json_objects(text: str, loads=json_loads):
+    """
+    Gera (trecho, objeto) para cada objeto JSON ({...}) do texto que loads consegue analisar.
+
+    Conta a profundidade das chaves ignorando as que aparecem dentro de strings. Quando o
+    trecho não fecha até o fim do texto ou não é JSON válido (uma chave ou aspa solta na
+    prosa, por exemplo), a varredura recomeça na próxima chave após o início descartado;
+    os fechamentos vêm de uma tabela calculada uma única vez, sem reler o texto.
+    """
+    ends = None
+    position = 0
+    while True:
+        start = text.find("{", position)
+        if start < 0:
+            return
+        if ends is None:
+            ends = _json_object_ends(text)
+        end = ends[start]
+        if end < 0:
+            position = start + 1
+            continue
+        candidate = text[start:end]
+        try:
+            data = loads(candidate)
+        except Exception:
+            position = start + 1
+            continue
+        yield candidate, data
+        position = end
+
+
+def _loads_tool_call_json(json_content: str):
+    """json_loads tolerante a objetos escritos só com aspas simples"""
+    # Converter aspas simples em aspas duplas se necessário
+    if "'" in json_content and '"' not in json_content:
+        json_content = json_content.replace("'", '"')
+    return json_loads(json_content)
+
+
+def scan_tool_call_patterns(text: str) -> Dict[str, list]:
+    """
+    Ocorrências de cada padrão de TOOL_CALL_SCAN_PATTERNS, no formato de `re.findall`.
+
+    Cada padrão varre o texto por conta própria: numa alternação única, uma ocorrência
+    de um padrão consumiria o texto em que um padrão posterior também casaria.
+    """
+    return {name: pattern.findall(text) for name, pattern in TOOL_CALL_SCAN_PATTERNS.items()}
+
+
+def _convert_dict_message(message: dict) -> dict:
+    # If message is already a dict, ensure it has required fields
+    if "role" not in message:
+        raise ValueError("Message dict must contain 'role' field")
+    return message
+
+
+def _convert_message_object(message: Message) -> dict:
+    # If message is a Message object, convert it to dict
+    return message.to_dict()
+
+
+def _convert_str_message(message: str) -> dict:
+    # Se for uma string, assumir como mensagem do usuário
+    logger.info(f"Convertendo mensagem string para formato de mensagem: {message[:50]}...")
+    return {"role": "user", "content": message}
+
+
+def _convert_other_message(message) -> dict:
+    # Subclasses dos tipos conhecidos seguem o conversor da classe base
+    if isinstance(message, dict):
+        return _convert_dict_message(message)
+    if isinstance(message, Message):
+        return _convert_message_object(message)
+    if isinstance(message, str):
+        return _convert_str_message(message)
+    # Tipo não suportado, log de aviso e conversão para string
+    logger.warning(f"Tipo de mensagem não reconhecido: {type(message)}, tentando converter para string")
+    try:
+        # Tenta converter para string como fallback
+        return {"role": "user", "content": str(message)}
+    except Exception as e:
+        raise TypeError(f"Não foi possível converter o tipo {type(message)} para string: {e}")
+
+
+# Conversor de cada tipo de mensagem aceito por format_messages (busca pelo tipo exato)
+MESSAGE_CONVERTERS = {
+    dict: _convert_dict_message,
+    Message: _convert_message_object,
+    str: _convert_str_message,
+}
+# Papéis válidos, para verificação de pertinência por hash
+VALID_ROLES = frozenset(ROLE_VALUES)
+
+
+class AssistantMessage:
+    """Resposta do assistente no formato Message-like esperado pelos agentes"""
+
+    __slots__ = ("role", "content", "tool_calls")
+
+    def __init__(self, role: str = "assistant", content: Optional[str] = None, tool_calls: Optional[list] = None):
+        self.role = role
+        self.content = content
+        self.tool_calls = tool_calls
+
+    def model_dump(self) -> dict:
+        return {"role": self.role, "content": self.content, "tool_calls": self.tool_calls}
+
+
 class LLM:
     _instances: Dict[str, "LLM"] = {}
+    # Protege a criação e a inicialização das instâncias compartilhadas
+    _lock = threading.Lock()
+    # Conteúdo de config/config.toml compartilhado entre instâncias (recarregado se o arquivo mudar)
+    _config_path: str = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "config.toml")
+    _config_cache: Optional[dict] = None
+    _config_mtime: float = 0.0
 
     def __new__(
         cls, config_name: str = "default", llm_config: Optional[LLMSettings] = None
     ):
-        if config_name not in cls._instances:
-            instance = super().__new__(cls)
-            instance.__init__(config_name, llm_config)
-            cls._instances[config_name] = instance
-        return cls._instances[config_name]
+        with cls._lock:
+            instance = cls._instances.get(config_name)
+            if instance is None:
+                instance = super().__new__(cls)
+                # __init__ é chamado pelo Python logo após __new__ e inicializa uma única vez
+                instance._initialized = False
+                cls._instances[config_name] = instance
+            return instance
 
     def __init__(
         self, config_name: str = "default", llm_config: Optional[LLMSettings] = None
     ):
-        if not hasattr(self, "client"):  # Only initialize if not already initialized
+        with self._lock:
+            if self._initialized:  # Only initialize if not already initialized
+                return
             if llm_config:
                 self.model = llm_config.model
                 self.max_tokens = llm_config.max_tokens
                 self.temperature = llm_config.temperature
                 self.api_key = llm_config.api_key
                 self.base_url = llm_config.base_url or "http://localhost:11434"
+                self.embedding_model = llm_config.embedding_model or self.model
+                self.keep_alive = llm_config.keep_alive
             else:
                 # Manually load config from toml
-                config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "config.toml")
-                with open(config_path, "r", encoding="utf-8") as f:
-                    config_data = toml.load(f)
+                config_data = self._load_config()
                 
                 llm_config = config_data.get("llm", {})
                 self.model = llm_config.get("model", "qwen2.5-coder:7b-instruct")
@@ -47,13 +347,52 @@ class LLM:
                 self.max_tokens = int(llm_config.get("max_tokens", 4096))
                 self.temperature = float(llm_config.get("temperature", 0.0))
                 self.api_key = llm_config.get("api_key", "")
+                # Modelo usado em /api/embed (o próprio modelo de chat, se não configurado)
+                self.embedding_model = llm_config.get("embedding_model", self.model)
+                # Tempo que o Ollama mantém o modelo (e o cache KV do prefixo) carregado
+                self.keep_alive = llm_config.get("keep_alive", DEFAULT_KEEP_ALIVE)
             
             self.session = None  # Will be initialized when needed
+            # Último status conhecido do Ollama e quando foi obtido
+            self._status_ok = False
+            self._status_checked_at = float("-inf")
+            # Prompts de ferramentas já montados, por (nome, descrição) das ferramentas
+            self._tools_prompt_cache: Dict[tuple, str] = {}
+            # Estado do circuit breaker de chamadas ao Ollama
+            self._consecutive_failures = 0
+            self._breaker_open_until = 0.0
+            self._breaker_message = ""
+            # Uso acumulado de tokens e taxa de reaproveitamento do prefixo nas últimas chamadas
+            self.usage = {"calls": 0, "prompt_tokens": 0, "prompt_eval_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+            self._cache_ratios: deque = deque(maxlen=CACHE_RATIO_WINDOW)
+            self._cache_ratio_warned = False
+            self._initialized = True
+
+    @classmethod
+    def _load_config(cls) -> dict:
+        """Carrega o config.toml uma única vez, relendo apenas se o arquivo for modificado"""
+        mtime = os.stat(cls._config_path).st_mtime
+        if cls._config_cache is None or mtime != cls._config_mtime:
+            with open(cls._config_path, "rb") as f:
+                cls._config_cache = tomllib.load(f)
+            cls._config_mtime = mtime
+        return cls._config_cache
 
     async def _ensure_session(self):
         """Ensure aiohttp session is initialized"""
         if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession()
+            # Conexões keep-alive reaproveitadas entre chamadas ao Ollama
+            connector = aiohttp.TCPConnector(
+                limit=0,
+                limit_per_host=32,
+                keepalive_timeout=75,
+                enable_cleanup_closed=True,
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=5, sock_read=90),
+                headers={"Content-Type": "application/json"},
+            )
         return self.session
         
     async def close(self):
@@ -61,25 +400,68 @@ class LLM:
         if hasattr(self, 'session') and self.session is not None and not self.session.closed:
             await self.session.close()
             self.session = None
+
+    @classmethod
+    async def close_all(cls):
+        """Fecha as sessões HTTP de todas as instâncias e esquece as instâncias registradas"""
+        with cls._lock:
+            instances = list(cls._instances.values())
+            cls._instances.clear()
+        await asyncio.gather(*(instance.close() for instance in instances), return_exceptions=True)
+
+    def __del__(self):
+        """Agenda o fechamento da sessão HTTP caso a instância seja descartada com ela aberta"""
+        session = getattr(self, "session", None)
+        if session is None or session.closed:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Sem loop em execução não é possível fechar a sessão de forma assíncrona
+            return
+        task = loop.create_task(session.close())
+        _SESSION_CLOSE_TASKS.add(task)
+        task.add_done_callback(_SESSION_CLOSE_TASKS.discard)
             
-    @retry(
-        wait=wait_random_exponential(min=1, max=10),
-        stop=stop_after_attempt(3),
-    )
     async def check_ollama_status(self):
-        """Verifica se o servidor Ollama está respondendo"""
+        """Verifica se o servidor Ollama está respondendo (resultado reaproveitado por alguns segundos)"""
+        if time.monotonic() - self._status_checked_at < OLLAMA_STATUS_TTL:
+            return self._status_ok
         try:
             session = await self._ensure_session()
             async with session.get(
                 f"{self.base_url}/api/tags",
                 timeout=5  # timeout curto para verificar disponibilidade
             ) as response:
-                if response.status == 200:
-                    return True
-                return False
+                return self._set_ollama_status(response.status == 200)
         except Exception as e:
             logger.warning(f"Erro ao verificar status do Ollama: {e}")
-            return False
+            return self._set_ollama_status(False)
+
+    def _set_ollama_status(self, ok: bool) -> bool:
+        """Registra o último status conhecido do Ollama"""
+        self._status_ok = ok
+        self._status_checked_at = time.monotonic()
+        return ok
+
+    async def embed(self, text: str) -> Optional[List[float]]:
+        """Gera o embedding do texto via /api/embed (None se o Ollama não puder gerá-lo)"""
+        try:
+            session = await self._ensure_session()
+            async with session.post(
+                f"{self.base_url}/api/embed",
+                json={"model": self.embedding_model, "input": text},
+                timeout=30,
+            ) as response:
+                if response.status != 200:
+                    logger.debug(f"Embedding indisponível: {await response.text()}")
+                    return None
+                result = await response.json(loads=json_loads)
+            embeddings = result.get("embeddings")
+            return embeddings[0] if embeddings else None
+        except Exception as e:
+            logger.debug(f"Erro ao gerar embedding: {e}")
+            return None
 
     @staticmethod
     def format_messages(messages: List[Union[dict, Message, str]]) -> List[dict]:
@@ -89,50 +471,20 @@ class LLM:
         """
         formatted_messages = []
 
+        # Conversão e validação em uma única passada
         for message in messages:
-            if isinstance(message, dict):
-                # If message is already a dict, ensure it has required fields
-                if "role" not in message:
-                    raise ValueError("Message dict must contain 'role' field")
-                formatted_messages.append(message)
-            elif isinstance(message, Message):
-                # If message is a Message object, convert it to dict
-                formatted_messages.append(message.to_dict())
-            elif isinstance(message, str):
-                # Se for uma string, assumir como mensagem do usuário
-                logger.info(f"Convertendo mensagem string para formato de mensagem: {message[:50]}...")
-                formatted_messages.append({
-                    "role": "user",
-                    "content": message
-                })
-            else:
-                # Tipo não suportado, log de aviso e conversão para string
-                logger.warning(f"Tipo de mensagem não reconhecido: {type(message)}, tentando converter para string")
-                try:
-                    # Tenta converter para string como fallback
-                    string_content = str(message)
-                    formatted_messages.append({
-                        "role": "user", 
-                        "content": string_content
-                    })
-                except Exception as e:
-                    raise TypeError(f"Não foi possível converter o tipo {type(message)} para string: {e}")
-
-        # Validate all messages have required fields
-        for msg in formatted_messages:
-            if msg["role"] not in ROLE_VALUES:
+            convert = MESSAGE_CONVERTERS.get(type(message), _convert_other_message)
+            msg = convert(message)
+            if msg["role"] not in VALID_ROLES:
                 raise ValueError(f"Invalid role: {msg['role']}")
             if "content" not in msg and "tool_calls" not in msg:
                 raise ValueError(
                     "Message must contain either 'content' or 'tool_calls'"
                 )
+            formatted_messages.append(msg)
 
         return formatted_messages
 
-    @retry(
-        wait=wait_random_exponential(min=1, max=20),
-        stop=stop_after_attempt(3),
-    )
     async def ask(
         self,
         messages: List[Union[dict, Message]],
@@ -143,15 +495,13 @@ class LLM:
         """
         Send a prompt to the Ollama LLM and get the response.
         """
-        # Verificar primeiro se o Ollama está disponível
-        try:
-            ollama_status = await self.check_ollama_status()
-            if not ollama_status:
-                raise ValueError("Ollama não está disponível. Verifique se o servidor está rodando.")
-        except Exception as e:
-            logger.error(f"Erro ao verificar status do Ollama: {e}")
-            return "Não foi possível conectar ao Ollama. Verifique se o servidor está rodando."
-            
+        # Após falhas consecutivas, responder imediatamente sem sobrecarregar o Ollama
+        if time.monotonic() < self._breaker_open_until:
+            logger.warning("Circuit breaker do Ollama aberto; retornando o último erro sem nova requisição")
+            return self._breaker_message
+
+        # Sem pré-verificação de status: a própria chamada ao /api/generate indica
+        # se o Ollama está disponível (erros de conexão são tratados abaixo)
         try:
             # Format system and user messages
             if system_msgs:
@@ -160,112 +510,269 @@ class LLM:
             else:
                 messages = self.format_messages(messages)
 
-            # Convert messages to a prompt format Ollama can understand
-            prompt = ""
-            for msg in messages:
-                role = msg["role"]
-                content = msg.get("content", "")
-                
-                if role == "system":
-                    prompt += f"<s>{content}</s>\n\n"
-                elif role == "user":
-                    prompt += f"{content}\n\n"
-                elif role == "assistant":
-                    prompt += f"{content}\n\n"
-                elif role == "tool":
-                    prompt += f"<tool>{content}</tool>\n\n"
-
-            # Prepare the request payload
+            # Convert messages to a prompt format Ollama can understand, já escapado
+            # para JSON e codificado (segmentos repetidos, como o prompt de sistema, vêm do cache)
+            prompt = b"".join(
+                encode_prompt_segment(msg["role"], msg.get("content", ""))
+                for msg in messages
+                if msg["role"] in PROMPT_ROLE_TEMPLATES
+            )
+
+            # Prepare the request payload: o prompt é inserido diretamente no corpo JSON
             payload = {
                 "model": self.model,
-                "prompt": prompt,
                 "stream": stream,
+                # Mantém o modelo carregado entre os passos: descarregá-lo descarta o
+                # cache KV do prefixo (prompt de sistema) e obriga a recalculá-lo
+                "keep_alive": self.keep_alive,
                 "options": {
                     "temperature": temperature or self.temperature,
                     "num_predict": self.max_tokens
                 }
             }
+            body = b'{"prompt":"' + prompt + b'",' + json_dumps(payload)[1:].encode("utf-8")
 
-            session = await self._ensure_session()
-            
-            if not stream:
-                # Non-streaming request
-                async with session.post(
-                    f"{self.base_url}/api/generate",
-                    headers={"Content-Type": "application/json"},
-                    json=payload,
-                    timeout=90  # aumentar timeout para evitar erros
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise ValueError(f"Error from Ollama API: {error_text}")
-                    
-                    result = await response.json()
-                    return result.get("response", "")
+            response = await self._generate(body, stream)
+            self._consecutive_failures = 0
+            return response
 
-            # Streaming request
-            collected_messages = []
-            
+        except aiohttp.ClientConnectorError as e:
+            logger.error(f"Erro ao conectar ao Ollama: {e}")
+            self._set_ollama_status(False)
+            return self._record_failure(OLLAMA_UNAVAILABLE_MESSAGE)
+        except (aiohttp.ServerTimeoutError, asyncio.TimeoutError) as e:
+            logger.error(f"Tempo limite ao chamar o Ollama: {e!r}")
+            return self._record_failure(OLLAMA_TIMEOUT_MESSAGE)
+        except RetryError as e:
+            logger.error("Máximo de tentativas esgotado ao chamar o Ollama")
+            if isinstance(e.last_attempt.exception(), (aiohttp.ServerTimeoutError, asyncio.TimeoutError)):
+                return self._record_failure(OLLAMA_TIMEOUT_MESSAGE)
+            return self._record_failure("O servidor Ollama não está respondendo após várias tentativas. Pode estar sem memória ou sobrecarregado.")
+        except Exception as e:
+            logger.error(f"Error in ask: {e}")
+            # Se houver erro de memória, fornecer uma resposta mais útil
+            if "out of memory" in str(e):
+                return self._record_failure("O Ollama está com problemas de memória. Tente reiniciar o servidor Ollama ou usar um modelo menor.")
+            if "NULL" in str(e) or "mem_buffer" in str(e):
+                return self._record_failure("O Ollama está enfrentando problemas de memória. Tente reiniciar o servidor.")
+            # Resposta genérica para outros erros
+            return self._record_failure(f"Ocorreu um erro ao processar sua solicitação: {str(e)}")
+
+    def _record_failure(self, message: str) -> str:
+        """Conta a falha e abre o circuit breaker ao atingir o limite de falhas consecutivas"""
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= BREAKER_FAILURE_THRESHOLD:
+            logger.warning(
+                f"{self._consecutive_failures} falhas consecutivas no Ollama; "
+                f"pausando novas requisições por {BREAKER_COOLDOWN:.0f}s"
+            )
+            self._breaker_open_until = time.monotonic() + BREAKER_COOLDOWN
+            self._breaker_message = message
+            self._consecutive_failures = 0
+        return message
+
+    def _record_usage(self, result: dict, body_size: int) -> None:
+        """
+        Registra o uso de tokens da chamada e acompanha o reaproveitamento do cache KV.
+
+        O Ollama não reporta tokens em cache; tokens do prompt que não foram avaliados
+        (estimativa do total menos prompt_eval_count) são contados como reaproveitados.
+        """
+        prompt_tokens = max(1, body_size // APPROX_BYTES_PER_TOKEN)
+        # Prompt inteiramente em cache: algumas versões do Ollama omitem prompt_eval_count
+        evaluated = min(int(result.get("prompt_eval_count") or 0), prompt_tokens)
+        cached = prompt_tokens - evaluated
+        completion = int(result.get("eval_count") or 0)
+
+        self.usage["calls"] += 1
+        self.usage["prompt_tokens"] += prompt_tokens
+        self.usage["prompt_eval_tokens"] += evaluated
+        self.usage["cached_tokens"] += cached
+        self.usage["completion_tokens"] += completion
+        self._cache_ratios.append(cached / prompt_tokens)
+        logger.debug(
+            "Uso de tokens: ~{} no prompt ({} avaliados, ~{} em cache), {} gerados",
+            prompt_tokens, evaluated, cached, completion,
+        )
+
+        if len(self._cache_ratios) < CACHE_RATIO_WINDOW:
+            return
+        ratio = sum(self._cache_ratios) / len(self._cache_ratios)
+        if ratio < CACHE_RATIO_WARNING_THRESHOLD:
+            # Avisar uma vez por queda, não a cada chamada
+            if not self._cache_ratio_warned:
+                logger.warning(
+                    "Reaproveitamento do cache de prompt em {:.0%} nas últimas {} chamadas; "
+                    "verifique se o prefixo estático do prompt mudou",
+                    ratio, len(self._cache_ratios),
+                )
+                self._cache_ratio_warned = True
+        else:
+            self._cache_ratio_warned = False
+
+    @retry(
+        retry=retry_if_exception(is_retryable_error),
+        wait=wait_random_exponential(min=1, max=20),
+        stop=stop_after_attempt(3),
+    )
+    async def _generate(self, body: bytes, stream: bool) -> str:
+        """Executa a chamada ao /api/generate (repetida apenas para falhas transitórias)"""
+        session = await self._ensure_session()
+        
+        if not stream:
+            # Non-streaming request
             async with session.post(
                 f"{self.base_url}/api/generate",
-                headers={"Content-Type": "application/json"},
-                json=payload,
+                data=body,
                 timeout=90  # aumentar timeout para evitar erros
             ) as response:
                 if response.status != 200:
                     error_text = await response.text()
                     raise ValueError(f"Error from Ollama API: {error_text}")
                 
-                # Process the streaming response
-                buffer = ""
-                async for chunk in response.content:
-                    buffer += chunk.decode('utf-8')
-                    if buffer.endswith('\n'):
-                        try:
-                            for line in buffer.strip().split('\n'):
-                                if line:
-                                    chunk_data = json.loads(line)
-                                    chunk_message = chunk_data.get("response", "")
-                                    collected_messages.append(chunk_message)
-                                    print(chunk_message, end="", flush=True)
-                        except json.JSONDecodeError:
-                            pass
-                        buffer = ""
-
-            print()  # Newline after streaming
-            full_response = "".join(collected_messages).strip()
-            if not full_response:
-                raise ValueError("Empty response from streaming LLM")
-            return full_response
-
-        except RetryError:
-            logger.error("Máximo de tentativas esgotado ao chamar o Ollama")
-            return "O servidor Ollama não está respondendo após várias tentativas. Pode estar sem memória ou sobrecarregado."
-        except Exception as e:
-            logger.error(f"Error in ask: {e}")
-            # Se houver erro de memória, fornecer uma resposta mais útil
-            if "out of memory" in str(e):
-                return "O Ollama está com problemas de memória. Tente reiniciar o servidor Ollama ou usar um modelo menor."
-            if "NULL" in str(e) or "mem_buffer" in str(e):
-                return "O Ollama está enfrentando problemas de memória. Tente reiniciar o servidor."
-            # Resposta genérica para outros erros
-            return f"Ocorreu um erro ao processar sua solicitação: {str(e)}"
+                result = await response.json()
+                self._record_usage(result, len(body))
+                return result.get("response", "")
+
+        # Streaming request
+        collected = io.StringIO()
+        last_flush = time.monotonic()
+        # Último chunk ("done": true) traz as contagens de tokens da chamada
+        final_chunk: Optional[dict] = None
+        
+        async with session.post(
+            f"{self.base_url}/api/generate",
+            data=body,
+            timeout=90  # aumentar timeout para evitar erros
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise ValueError(f"Error from Ollama API: {error_text}")
+            
+            def process_line(line: bytes) -> None:
+                nonlocal last_flush, final_chunk
+                if not line.strip():
+                    return
+                try:
+                    chunk_data = json_loads(line)
+                except json.JSONDecodeError:
+                    return
+                if chunk_data.get("done"):
+                    final_chunk = chunk_data
+                chunk_message = chunk_data.get("response", "")
+                collected.write(chunk_message)
+                # Flush periódico em vez de um flush (syscall) por token
+                sys.stdout.write(chunk_message)
+                now = time.monotonic()
+                if now - last_flush > STREAM_FLUSH_INTERVAL:
+                    sys.stdout.flush()
+                    last_flush = now
+
+            # Process the streaming response (NDJSON): as linhas são separadas nos bytes
+            # brutos e cada linha completa é decodificada só no json_loads; "\n" tem um
+            # único byte, então nunca divide um caractere multibyte
+            buffer = bytearray()
+            async for chunk in response.content.iter_any():
+                buffer += chunk
+                start = 0
+                end = buffer.find(b"\n")
+                while end != -1:
+                    process_line(bytes(buffer[start:end]))
+                    start = end + 1
+                    end = buffer.find(b"\n", start)
+                # Manter apenas a linha incompleta no buffer
+                del buffer[:start]
+            # Última linha pode chegar sem quebra de linha final
+            process_line(bytes(buffer))
+
+        print(flush=True)  # Newline after streaming
+        if final_chunk is not None:
+            self._record_usage(final_chunk, len(body))
+        full_response = collected.getvalue().strip()
+        if not full_response:
+            raise ValueError("Empty response from streaming LLM")
+        return full_response
+
+    async def ask_many(
+        self,
+        prompts: List[Union[str, List[Union[dict, Message]]]],
+        concurrency: int = 4,
+        row_marshal: bool = False,
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        temperature: Optional[float] = None,
+    ) -> List[Union[str, BaseException]]:
+        """
+        Envia vários prompts ao Ollama com no máximo `concurrency` requisições simultâneas.
+
+        Args:
+            prompts: Prompts (texto ou lista de mensagens), um por resposta esperada
+            concurrency: Número máximo de requisições em paralelo
+            row_marshal: Agrupa prompts de texto em uma única requisição, separados por
+                marcadores de linha; útil para muitos prompts pequenos quando a latência
+                individual não importa
+            system_msgs: Mensagens de sistema enviadas junto com cada prompt
+            temperature: Temperatura de amostragem
+
+        Returns:
+            Respostas na mesma ordem dos prompts (ou a exceção levantada para cada um)
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def ask_one(prompt):
+            messages = [prompt] if isinstance(prompt, str) else prompt
+            async with semaphore:
+                return await self.ask(
+                    messages, system_msgs=system_msgs, stream=False, temperature=temperature
+                )
+
+        if row_marshal and len(prompts) > 1 and all(isinstance(p, str) for p in prompts):
+            responses = await self._ask_marshaled(prompts, system_msgs, temperature)
+            # Linhas que o modelo não devolveu no formato esperado são pedidas individualmente
+            missing = [i for i, response in enumerate(responses) if response is None]
+            if missing:
+                logger.warning(f"{len(missing)} respostas ausentes no lote; consultando individualmente")
+                retried = await asyncio.gather(
+                    *(ask_one(prompts[i]) for i in missing), return_exceptions=True
+                )
+                for i, response in zip(missing, retried):
+                    responses[i] = response
+            return responses
+
+        return await asyncio.gather(*(ask_one(p) for p in prompts), return_exceptions=True)
+
+    async def _ask_marshaled(
+        self,
+        prompts: List[str],
+        system_msgs: Optional[List[Union[dict, Message]]],
+        temperature: Optional[float],
+    ) -> List[Optional[str]]:
+        """Envia vários prompts em uma única requisição e separa a resposta por marcador de linha"""
+        rows = "".join(ROW_MARKER.format(index=i) + prompt for i, prompt in enumerate(prompts))
+        response = await self.ask(
+            [ROW_MARSHAL_INSTRUCTIONS + rows],
+            system_msgs=system_msgs,
+            stream=False,
+            temperature=temperature,
+        )
+        responses: List[Optional[str]] = [None] * len(prompts)
+        # split com grupo de captura alterna [texto, índice, texto, índice, texto, ...]
+        parts = ROW_MARKER_PATTERN.split(response)
+        for index, text in zip(parts[1::2], parts[2::2]):
+            index = int(index)
+            if index < len(prompts) and responses[index] is None:
+                responses[index] = text.strip()
+        return responses
 
     def extract_tool_call(self, response_text, tools):
         """Extrai chamada de ferramenta de texto não estruturado de forma mais robusta"""
         
+        # Ocorrências de todos os padrões abaixo, por padrão
+        found = scan_tool_call_patterns(response_text)
+        
         # NOVO: Detectar chamadas de função em padrões de código Python
         # Para web_search
-        web_search_patterns = [
-            r'(?:function|name)\s*=\s*["\']web_search["\']\s*,\s*(?:arguments|args|params|query)\s*=\s*(?:{[^}]*"query"\s*:\s*"([^"]+)"[^}]*}|"([^"]+)")',
-            r'web_search\((?:[^)]*query=)?["\']([^"\']+)["\']',
-            r'"name"\s*:\s*"web_search".*?"query"\s*:\s*"([^"]+)"',
-            r'sua consulta aqui|elon musk',  # Valores de exemplo/placeholder comuns
-        ]
-        
-        for pattern in web_search_patterns:
-            matches = re.findall(pattern, response_text, re.DOTALL)
-            for match in matches:
+        for i in range(len(WEB_SEARCH_PATTERNS)):
+            for match in found[f"web_search_{i}"]:
                 if isinstance(match, tuple):  # Pode ter múltiplos grupos de captura
                     query = next((m for m in match if m), "")
                 else:
@@ -276,26 +783,19 @@ class LLM:
                     return "web_search", {"query": query}
         
         # NOVO: Para browser_use
-        browser_use_patterns = [
-            r'(?:function|name)\s*=\s*["\']browser_use["\']\s*,\s*(?:arguments|args|params)\s*=\s*{[^}]*"(?:action|url)"\s*:\s*"([^"]+)".*?"(?:action|url)"\s*:\s*"([^"]+)"',
-            r'browser_use\([^)]*(?:action=)?["\']([^"\']+)["\'][^)]*(?:url=)?["\']([^"\']+)["\']',
-        ]
-        
-        for pattern in browser_use_patterns:
-            matches = re.findall(pattern, response_text, re.DOTALL)
-            for match in matches:
+        for i in range(len(BROWSER_USE_PATTERNS)):
+            for match in found[f"browser_use_{i}"]:
                 # Determinar qual é a ação e qual é a URL
-                if match[0] in ["navigate", "get_text", "get_html", "click"]:
+                if match[0] in BROWSER_ACTIONS:
                     action, url = match[0], match[1]
                 else:
-                    url, action = match[0], match[1] if len(match) > 1 and match[1] in ["navigate", "get_text", "get_html", "click"] else "navigate"
+                    url, action = match[0], match[1] if len(match) > 1 and match[1] in BROWSER_ACTIONS else "navigate"
                     
-                if url and "exemplo.com" not in url:  # Não usar URLs de exemplo
+                if url and not any(fake in url for fake in FAKE_URLS):  # Não usar URLs de exemplo
                     return "browser_use", {"action": action, "url": url}
         
         # Tentar extrair JSON entre marcadores de código
-        json_pattern = r"```(?:json|tool|tool_code|python)?\s*({[\s\S]*?})\s*```"
-        matches = re.findall(json_pattern, response_text)
+        matches = found["json_code_block"]
         
         if matches:
             for match in matches:
@@ -310,7 +810,7 @@ class LLM:
                     if "'" in match and '"' not in match:
                         match = match.replace("'", '"')
                         
-                    data = json.loads(match)
+                    data = json_loads(match)
                     # Verificar se tem os campos esperados para uma ferramenta
                     if "tool_name" in data or "name" in data:
                         tool_name = data.get("tool_name") or data.get("name")
@@ -323,7 +823,7 @@ class LLM:
                         if tool_name:
                             if isinstance(args, str):
                                 try:
-                                    args = json.loads(args)
+                                    args = json_loads(args)
                                 except:
                                     pass
                             return tool_name, args
@@ -339,16 +839,11 @@ class LLM:
         
         # Tentar extrair JSON de qualquer lugar no texto
         try:
-            # Procurar por JSON que contenha chaves relevantes
-            json_blocks = re.findall(r'\{[^{}]*(?:"function"|"name"|"tool_name"|"query"|"action"|"url")[^{}]*\}', response_text)
-            
-            for json_content in json_blocks:
-                # Converter aspas simples em aspas duplas se necessário
-                if "'" in json_content and '"' not in json_content:
-                    json_content = json_content.replace("'", '"')
-                    
+            # Procurar por JSON que contenha chaves relevantes (varredura linear de chaves)
+            for json_content, data in iter_json_objects(response_text, _loads_tool_call_json):
+                if not any(key in json_content for key in TOOL_CALL_JSON_KEYS):
+                    continue
                 try:
-                    data = json.loads(json_content)
                     if "tool_name" in data or "name" in data:
                         tool_name = data.get("tool_name") or data.get("name")
                         args = data.get("arguments") or data.get("args") or {}
@@ -360,7 +855,7 @@ class LLM:
                         if tool_name:
                             if isinstance(args, str):
                                 try:
-                                    args = json.loads(args)
+                                    args = json_loads(args)
                                 except:
                                     pass
                             return tool_name, args
@@ -391,7 +886,7 @@ class LLM:
                                 if json_end > json_start:
                                     try:
                                         json_content = part[json_start:json_end+1]
-                                        args = json.loads(json_content)
+                                        args = json_loads(json_content)
                                         return tool_name, args
                                     except:
                                         pass
@@ -409,7 +904,7 @@ class LLM:
                     end_idx = response_text.rfind("}")
                     if end_idx > start_idx:
                         json_content = response_text[start_idx:end_idx+1]
-                        args = json.loads(json_content)
+                        args = json_loads(json_content)
                         # Verifica se há pelos menos um argumento válido
                         if isinstance(args, dict) and len(args) > 0:
                             return tool_name, args
@@ -419,7 +914,7 @@ class LLM:
             # Se não encontrou JSON, mas é uma ferramenta simples como get_weather,
             # tenta extrair o argumento de location do texto
             if tool_name == "get_weather":
-                location_match = re.search(r'em\s+([^?\.!]+)', response_text)
+                location_match = LOCATION_PATTERN.search(response_text)
                 if location_match:
                     location = location_match.group(1).strip()
                     return tool_name, {"location": location}
@@ -436,6 +931,16 @@ class LLM:
                 "content": response_text
             }
         
+        # Triagem barata: texto comum não passa pela extração (exceto o caso especial
+        # get_weather, que extrai a localização de texto livre)
+        if not any(needle in response_text for needle in TOOL_CALL_NEEDLES) and not (
+            len(tools) == 1 and tools[0].get("function", {}).get("name") == "get_weather"
+        ):
+            return {
+                "role": "assistant",
+                "content": response_text
+            }
+        
         # Tentar extrair tool call
         tool_name, args = self.extract_tool_call(response_text, tools)
         
@@ -446,7 +951,7 @@ class LLM:
                 "type": "function",
                 "function": {
                     "name": tool_name,
-                    "arguments": json.dumps(args)
+                    "arguments": json_dumps(args)
                 }
             }
             
@@ -462,6 +967,23 @@ class LLM:
                 "content": response_text
             }
 
+    def _tools_prompt(self, tools: List[dict]) -> str:
+        """Prompt de sistema descrevendo as ferramentas, reaproveitado enquanto a lista não mudar"""
+        # to_params() gera uma lista nova a cada chamada, então a chave é o conteúdo (nome, descrição)
+        entries = tuple(
+            (tool["function"].get("name", "unknown"), tool["function"].get("description", "No description"))
+            for tool in tools
+            if tool.get("type") == "function" and "function" in tool
+        )
+        prompt = self._tools_prompt_cache.get(entries)
+        if prompt is None:
+            tools_desc = "Você tem acesso às seguintes ferramentas:\n" + "".join(
+                f"- {name}: {description}\n" for name, description in entries
+            )
+            prompt = f"{tools_desc}\n\n{TOOL_INSTRUCTIONS}"
+            self._tools_prompt_cache[entries] = prompt
+        return prompt
+
     async def ask_tool(
         self,
         messages: List[Union[dict, Message]],
@@ -485,32 +1007,11 @@ class LLM:
                 system_msgs_formatted = self.format_messages(system_msgs)
                 formatted_messages.extend(system_msgs_formatted)
             
-            # Adicionar instruções específicas para formatação de ferramenta
+            # Adicionar descrição das ferramentas e instruções de formatação como mensagem do sistema
             if tools:
-                tool_instructions = """
-                Para utilizar uma ferramenta, responda neste formato:
-                ```json
-                {
-                  "tool_name": "NOME_DA_FERRAMENTA",
-                  "arguments": {
-                    "arg1": "valor1",
-                    "arg2": "valor2"
-                  }
-                }
-                ```
-                Se não for usar uma ferramenta, responda normalmente em texto.
-                """
-                
-                tools_desc = "Você tem acesso às seguintes ferramentas:\n"
-                for tool in tools:
-                    if tool.get("type") == "function" and "function" in tool:
-                        func = tool["function"]
-                        tools_desc += f"- {func.get('name', 'unknown')}: {func.get('description', 'No description')}\n"
-                
-                # Adicionar descrição das ferramentas como mensagem do sistema
                 formatted_messages.append({
                     "role": "system",
-                    "content": f"{tools_desc}\n\n{tool_instructions}"
+                    "content": self._tools_prompt(tools)
                 })
             
             # Adicionar mensagens do usuário
@@ -524,8 +1025,8 @@ class LLM:
             )
             
             # Se a resposta contiver uma mensagem de erro, retorná-la diretamente
-            if response_text.startswith("O Ollama está com problemas") or response_text.startswith("Não foi possível conectar"):
-                return type('ErrorMessage', (), {'content': response_text, 'tool_calls': None, 'role': 'assistant'})
+            if response_text.startswith("O Ollama está com problemas") or response_text.startswith(OLLAMA_UNAVAILABLE_MESSAGE):
+                return AssistantMessage(content=response_text)
             
             # Transformar resposta para formato OpenAI
             response = self.transform_to_openai_format(response_text, tools)
@@ -537,18 +1038,7 @@ class LLM:
                     logger.info(f"Tool calls após transformação: {response['tool_calls']}")
             
             # Criar um objeto Message-like que corresponda ao esperado
-            class MockMessage:
-                def __init__(self, data):
-                    for key, value in data.items():
-                        setattr(self, key, value)
-
-                def __getattr__(self, name):
-                    return None
-                    
-                def model_dump(self):
-                    return {k: v for k, v in self.__dict__.items() if not k.startswith('_')}
-
-            return MockMessage(response)
+            return AssistantMessage(**response)
                 
         except Exception as e:
             logger.error(f"Error in ask_tool: {e}")
@@ -557,4 +1047,4 @@ class LLM:
             if "out of memory" in str(e):
                 error_message = "O Ollama está com problemas de memória. Tente reiniciar o servidor."
             
-            return type('ErrorMessage', (), {'content': error_message, 'tool_calls': None, 'role': 'assistant'})
+            return AssistantMessage(content=error_message)
@@ -1,3 +1,4 @@
+import inspect
 from abc import ABC, abstractmethod
 from typing import Any, Dict, Optional
 
@@ -14,11 +15,15 @@ class BaseTool(ABC, BaseModel):
 
     async def __call__(self, **kwargs) -> Any:
         """Execute the tool with given parameters."""
-        return await self.execute(**kwargs)
+        result = self.execute(**kwargs)
+        # Ferramentas triviais podem implementar execute como função comum (sem corrotina)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
 
     @abstractmethod
     async def execute(self, **kwargs) -> Any:
-        """Execute the tool with given parameters."""
+        """Execute the tool with given parameters (may be a plain function for trivial tools)."""
 
     def to_param(self) -> Dict:
         """Convert tool to function call format."""
@@ -38,6 +43,8 @@ class ToolResult(BaseModel):
     output: Any = Field(default=None)
     error: Optional[str] = Field(default=None)
     system: Optional[str] = Field(default=None)
+    # Dados estruturados da saída, para quem consome o resultado em código sem reinterpretar o texto
+    data: Any = Field(default=None)
 
     class Config:
         arbitrary_types_allowed = True
@@ -65,6 +72,8 @@ class ToolResult(BaseModel):
             output=combine_fields(self.output, other.output),
             error=combine_fields(self.error, other.error),
             system=combine_fields(self.system, other.system),
+            # Dados estruturados não se concatenam: só um dos resultados pode trazê-los
+            data=combine_fields(self.data, other.data, concatenate=False),
         )
 
     def __str__(self):
@@ -0,0 +1,127 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from pydantic import Field
+
+from app.logger import logger
+from app.tool.base import BaseTool, ToolResult
+from app.tool.tool_collection import ToolCollection
+
+
+_BATCH_DESCRIPTION = """Execute several tool calls in a single step.
+Use this tool when you already know multiple independent calls to make (for example,
+reading several URLs returned by web_search) instead of spending one step per call.
+Calls to the same tool run in the order given (so a browser_use 'navigate' followed by
+'get_text' stays paired); calls to different tools run concurrently.
+browser_use and fetch_page share the same browser page, so when a batch contains browser_use
+calls, all of its browser_use and fetch_page calls run one after another in the order given.
+Without browser_use, fetch_page calls run concurrently.
+Example:
+{"function": {"name": "batch", "arguments": {"invocations": [
+  {"tool_name": "fetch_page", "arguments": {"url": "https://exemplo.com"}},
+  {"tool_name": "fetch_page", "arguments": {"url": "https://exemplo.org"}}
+]}}}
+The 'terminate' tool cannot be used inside a batch.
+"""
+
+# Ferramentas que não podem ser executadas dentro de um batch
+NON_BATCHABLE_TOOLS = frozenset({"batch", "terminate"})
+# Ferramentas que usam a mesma página do navegador: não podem se intercalar com browser_use
+BROWSER_TOOLS = frozenset({"browser_use", "fetch_page"})
+
+
+class BatchTool(BaseTool):
+    name: str = "batch"
+    description: str = _BATCH_DESCRIPTION
+    parameters: dict = {
+        "type": "object",
+        "properties": {
+            "invocations": {
+                "type": "array",
+                "description": "(required) The tool calls to execute.",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "tool_name": {
+                            "type": "string",
+                            "description": "Name of the tool to call.",
+                        },
+                        "arguments": {
+                            "type": "object",
+                            "description": "Arguments for the tool call.",
+                        },
+                    },
+                    "required": ["tool_name"],
+                },
+            },
+        },
+        "required": ["invocations"],
+    }
+
+    # Coleção de ferramentas do agente usada para despachar cada chamada
+    tools: Optional[ToolCollection] = Field(default=None, exclude=True)
+
+    async def execute(self, invocations: List[Dict[str, Any]], **kwargs) -> ToolResult:
+        """
+        Execute the given tool calls, grouping calls to the same tool (or to the shared browser)
+        so they keep their order.
+
+        Args:
+            invocations: List of {"tool_name": ..., "arguments": {...}} entries
+
+        Returns:
+            ToolResult with the output of every call, in the original order
+        """
+        if self.tools is None:
+            return ToolResult(error="Batch tool is not attached to a tool collection")
+        if not isinstance(invocations, list) or not invocations:
+            return ToolResult(error="'invocations' must be a non-empty list")
+
+        results: List[str] = [""] * len(invocations)
+        # Com browser_use no batch, todas as chamadas que usam o navegador formam um único grupo;
+        # sem ele, cada fetch_page (HTTP direto, ou navegar e extrair sob o lock) roda em paralelo
+        uses_browser = any(
+            isinstance(invocation, dict) and invocation.get("tool_name") == "browser_use"
+            for invocation in invocations
+        )
+        # Chamadas agrupadas por ferramenta: sequenciais dentro do grupo, grupos em paralelo
+        groups: Dict[str, List[int]] = defaultdict(list)
+        for i, invocation in enumerate(invocations):
+            tool_name = invocation.get("tool_name") if isinstance(invocation, dict) else None
+            if not tool_name:
+                results[i] = "Error: invocation without 'tool_name'"
+            elif tool_name in NON_BATCHABLE_TOOLS:
+                results[i] = f"Error: '{tool_name}' cannot be used inside a batch"
+            elif tool_name not in self.tools.tool_map:
+                results[i] = f"Error: Tool {tool_name} is invalid"
+            elif tool_name in BROWSER_TOOLS and uses_browser:
+                groups["browser"].append(i)
+            elif tool_name == "fetch_page":
+                groups[f"fetch_page#{i}"].append(i)
+            else:
+                groups[tool_name].append(i)
+
+        async def run_group(indices: List[int]) -> None:
+            for i in indices:
+                tool_name = invocations[i]["tool_name"]
+                arguments = invocations[i].get("arguments") or {}
+                try:
+                    result = await self.tools.execute(name=tool_name, tool_input=arguments)
+                except Exception as e:
+                    logger.warning("Erro na chamada {} do batch ({}): {}", i + 1, tool_name, e)
+                    result = ToolResult(error=str(e))
+                if isinstance(result, ToolResult):
+                    results[i] = f"Error: {result.error}" if result.error else str(result.output)
+                else:
+                    results[i] = str(result)
+
+        logger.info("Executando batch com {} chamadas em {} grupos", len(invocations), len(groups))
+        await asyncio.gather(*(run_group(indices) for indices in groups.values()))
+
+        return ToolResult(
+            output="\n\n".join(
+                f"[{i + 1}] {invocation.get('tool_name') if isinstance(invocation, dict) else '?'}:\n{result}"
+                for i, (invocation, result) in enumerate(zip(invocations, results))
+            )
+        )
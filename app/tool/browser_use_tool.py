@@ -1,20 +1,202 @@
 import asyncio
-import json
-from typing import Optional
-
-from browser_use import Browser as BrowserUseBrowser
-from browser_use import BrowserConfig
-from browser_use.browser.context import BrowserContext, BrowserContextConfig
-from browser_use.dom.service import DomService
-from pydantic import Field, field_validator
+import re
+import weakref
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, ClassVar, Dict, List, Optional, Tuple
+
+from pydantic import Field, PrivateAttr, field_validator
 from pydantic_core.core_schema import ValidationInfo
 
 from app.config import config
+from app.llm import json_dumps
 from app.tool.base import BaseTool, ToolResult
 from app.logger import logger
 
+# browser_use (e o Playwright) só é importado quando o navegador é usado pela primeira vez
+if TYPE_CHECKING:
+    from browser_use.browser.context import BrowserContext
+    from browser_use.dom.service import DomService
+
+
+# Limites de caracteres devolvidos por get_text e get_html
+MAX_TEXT_LENGTH = 2000
+MAX_HTML_LENGTH = 250000
+# Opções do [browser] do config.toml repassadas ao BrowserConfig
+BROWSER_CONFIG_ATTRS = (
+    "headless",
+    "disable_security",
+    "extra_chromium_args",
+    "chrome_instance_path",
+    "wss_url",
+    "cdp_url",
+)
+# Máximo de processos do navegador e de contextos (ferramentas) por navegador no pool
+MAX_BROWSERS = 2
+MAX_CONTEXTS_PER_BROWSER = 4
+# Ações que alteram o ciclo de vida das abas (executadas sob o _tab_lock)
+TAB_ACTIONS = frozenset({"new_tab", "close_tab", "switch_tab"})
+# Ações que alteram a página atual (executadas sob o lock da própria aba)
+PAGE_ACTIONS = frozenset({"navigate", "click", "input_text", "scroll", "refresh", "execute_js"})
+
+# Scripts JavaScript executados nas páginas (constantes: não são remontados a cada chamada)
+# Usado só quando o status HTTP da navegação não foi observado (detecta "soft 404")
+JS_SOFT_404_CHECK = """(function() {
+    // Verificar status com base no conteúdo da página
+    if (document.title.includes('404') || 
+        document.body.textContent.includes('not found') ||
+        document.body.textContent.includes('404') ||
+        document.body.textContent.includes('não encontrada')) {
+        return 404;
+    }
+    return 200;
+})();"""
+
+# Métodos de extração de HTML do get_html, na ordem em que são disparados
+HTML_EXTRACTION_METHODS = ("standard", "javascript_outerhtml", "javascript_innerhtml", "serialized", "text_content")
+# Tags que indicam um documento HTML completo (busca sem criar cópias em minúsculas)
+HTML_TAG_PATTERN = re.compile(r"<html", re.IGNORECASE)
+BODY_TAG_PATTERN = re.compile(r"<body", re.IGNORECASE)
+# Tempo máximo (ms) de espera pelo carregamento do DOM antes de extrair o conteúdo
+PAGE_LOAD_TIMEOUT_MS = 5000
+# Máximo de caracteres de HTML transferidos do navegador (mesmo limite do get_html)
+MAX_JS_PAYLOAD = MAX_HTML_LENGTH
+
+# Os scripts de HTML cortam o conteúdo no próprio navegador, antes de atravessar o CDP,
+# e devolvem {html, length} para preservar o tamanho original
+JS_OUTER_HTML = f"""
+(function() {{
+    const html = document.documentElement.outerHTML;
+    return {{html: html.slice(0, {MAX_JS_PAYLOAD}), length: html.length}};
+}})()
+"""
+
+JS_INNER_HTML = f"""
+(function() {{
+    const html = document.body.innerHTML;
+    return {{html: html.slice(0, {MAX_JS_PAYLOAD}), length: html.length}};
+}})()
+"""
+
+JS_SERIALIZED_HTML = f"""
+(function() {{
+    try {{
+        let parser = new DOMParser();
+        let serializer = new XMLSerializer();
+        let doc = parser.parseFromString(document.documentElement.outerHTML, "text/html");
+        const html = serializer.serializeToString(doc);
+        return {{html: html.slice(0, {MAX_JS_PAYLOAD}), length: html.length}};
+    }} catch(e) {{
+        return "Error: " + e.message;
+    }}
+}})()
+"""
+
+JS_TEXT_NODES = f"""
+(function() {{
+    const textNodes = [];
+    const walk = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+    let node;
+    while(node = walk.nextNode()) {{
+        if (node.textContent.trim().length > 0) {{
+            textNodes.push(node.textContent.trim());
+        }}
+    }}
+    const text = textNodes.join('\\n');
+    return {{html: text.slice(0, {MAX_JS_PAYLOAD}), length: text.length}};
+}})()
+"""
 
-MAX_LENGTH = 2000
+JS_VISIBLE_TEXT = """
+(function() {
+    try {
+        // Uma única passada pelos nós de texto; offsetParent nulo indica elemento oculto
+        // (verificação barata, sem getComputedStyle por elemento)
+        function extractVisibleText() {
+            const textParts = [];
+            const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT, {
+                acceptNode: (node) => {
+                    const parent = node.parentElement;
+                    return parent && parent.offsetParent !== null && node.textContent.trim()
+                        ? NodeFilter.FILTER_ACCEPT
+                        : NodeFilter.FILTER_REJECT;
+                }
+            });
+            let node;
+            while (node = walker.nextNode()) {
+                textParts.push(node.textContent.trim());
+            }
+            return textParts.join('\\n');
+        }
+
+        // Tentar extrair texto com método mais seguro
+        const extractedText = extractVisibleText();
+        if (extractedText && extractedText.length > 0) {
+            return extractedText;
+        }
+
+        // Fallbacks sequenciais
+        if (document.body.innerText && document.body.innerText.length > 0) {
+            return document.body.innerText;
+        }
+
+        if (document.body.textContent && document.body.textContent.length > 0) {
+            return document.body.textContent;
+        }
+
+        return 'Nenhum texto extraído';
+    } catch (e) {
+        return 'Erro na extração de texto: ' + e.message;
+    }
+})();
+"""
+
+JS_TEXT_CONTENT = "document.body.textContent.replace(/\\s+/g, ' ').trim()"
+
+# Devolve [texto, href] de cada link com texto (console.log não retorna nada ao Python)
+JS_READ_LINKS = "Array.from(document.querySelectorAll('a[href]'), (a) => a.innerText ? [a.innerText.trim(), a.href] : null).filter(Boolean)"
+
+# Páginas devolvidas ao agente quando o get_html falha
+EXTRACTION_FAILED_HTML = """
+<html>
+<body>
+<h1>⚠️ Erro na extração do conteúdo</h1>
+<p>Não foi possível obter o conteúdo HTML desta página. Isso pode ocorrer por vários motivos:</p>
+<ul>
+    <li>O site usa técnicas anti-scraping</li>
+    <li>O site requer interação do usuário (login ou CAPTCHA)</li>
+    <li>Problemas de conexão ou timeout</li>
+    <li>Conteúdo dinâmico que requer JavaScript</li>
+</ul>
+<p><strong>Recomendação:</strong> Tente acessar outra URL dos resultados da busca.</p>
+<p><strong>IMPORTANTE:</strong> Você deve tentar com uma das outras URLs retornadas pelo comando web_search. Use o comando browser_use com action=navigate para acessar outra URL da lista.</p>
+</body>
+</html>
+"""
+
+EXTRACTION_TIMEOUT_HTML = """
+<html>
+<body>
+<h1>⚠️ Erro: Timeout na extração</h1>
+<p>Não foi possível extrair o HTML desta página dentro do tempo limite (30 segundos).</p>
+<p>Isso geralmente ocorre em páginas muito complexas ou com problemas de carregamento.</p>
+<p><strong>Solução recomendada:</strong> Tente uma das seguintes opções:</p>
+<ol>
+    <li>Use o comando browser_use com action=get_text para extrair apenas o texto da página atual</li>
+    <li>Tente acessar outra URL dos resultados da pesquisa</li>
+</ol>
+</body>
+</html>
+"""
+
+EXTRACTION_ERROR_HTML_TEMPLATE = """
+<html>
+<body>
+<h1>❌ Erro na extração de HTML</h1>
+<p>Ocorreu um erro ao tentar extrair o HTML desta página:</p>
+<pre>{error}</pre>
+<p>Tente usar action=get_text como alternativa, ou acesse outra URL dos resultados.</p>
+</body>
+</html>
+"""
 
 _BROWSER_DESCRIPTION = """
 Interact with a web browser to perform various actions such as navigation, element interaction,
@@ -23,8 +205,8 @@ content extraction, and tab management. Supported actions include:
 - 'click': Click an element by index
 - 'input_text': Input text into an element
 - 'screenshot': Capture a screenshot
-- 'get_html': Get page HTML content
-- 'get_text': Get text content of the page
+- 'get_html': Get page HTML content (navigates first when 'url' is given)
+- 'get_text': Get text content of the page (navigates first when 'url' is given)
 - 'read_links': Get all links on the page
 - 'execute_js': Execute JavaScript code
 - 'scroll': Scroll the page
@@ -32,9 +214,111 @@ content extraction, and tab management. Supported actions include:
 - 'new_tab': Open a new tab
 - 'close_tab': Close the current tab
 - 'refresh': Refresh the current page
+- 'batch': Run several of the actions above in order, in one call (stops at the first error)
+The action 'extract_text' is NOT supported; use 'get_text' or 'get_html'.
+To simply read a page, prefer the fetch_page tool, which navigates and extracts in one call.
 """
 
 
+def create_browser(headless: Optional[bool] = None) -> Any:
+    """
+    Cria um navegador do browser_use com as opções do [browser] do config.toml.
+
+    Args:
+        headless: Quando informado, substitui o headless do config.toml
+    """
+    from browser_use import Browser as BrowserUseBrowser
+    from browser_use import BrowserConfig
+
+    browser_config_kwargs = {"headless": False}
+
+    if config.browser_config:
+        from browser_use.browser.browser import ProxySettings
+
+        # handle proxy settings.
+        if config.browser_config.proxy and config.browser_config.proxy.server:
+            browser_config_kwargs["proxy"] = ProxySettings(
+                server=config.browser_config.proxy.server,
+                username=config.browser_config.proxy.username,
+                password=config.browser_config.proxy.password,
+            )
+
+        for attr in BROWSER_CONFIG_ATTRS:
+            value = getattr(config.browser_config, attr, None)
+            if value is not None:
+                if not isinstance(value, list) or value:
+                    browser_config_kwargs[attr] = value
+    if headless is not None:
+        browser_config_kwargs["headless"] = headless
+
+    try:
+        return BrowserUseBrowser(BrowserConfig(**browser_config_kwargs))
+    except Exception as e:
+        logger.error(f"Erro ao inicializar o navegador: {str(e)}")
+        if "disable_security" in browser_config_kwargs:
+            raise RuntimeError(f"Não foi possível inicializar o navegador: {str(e)}")
+
+    # Tente com argumento de segurança desativado
+    browser_config_kwargs["disable_security"] = True
+    try:
+        browser = BrowserUseBrowser(BrowserConfig(**browser_config_kwargs))
+    except Exception as inner_e:
+        raise RuntimeError(f"Não foi possível inicializar o navegador: {str(inner_e)}")
+    logger.info("Navegador inicializado com segurança desativada")
+    return browser
+
+
+class BrowserPool:
+    """
+    Navegadores compartilhados entre as instâncias de BrowserUseTool.
+
+    Cada ferramenta abre o próprio contexto em um navegador do pool em vez de iniciar um
+    processo do Chromium só para ela; um novo navegador só é criado quando todos os
+    existentes atingem o limite de contextos (e enquanto não houver `max_browsers`).
+    """
+
+    def __init__(self, max_browsers: int = MAX_BROWSERS, max_contexts: int = MAX_CONTEXTS_PER_BROWSER):
+        self.max_browsers = max_browsers
+        self.max_contexts = max_contexts
+        # Navegador -> número de ferramentas usando-o
+        self._usage: Dict[Any, int] = {}
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, factory: Callable[[], Any]) -> Any:
+        """Retorna o navegador menos ocupado, criando um novo com `factory` se necessário."""
+        async with self._lock:
+            browser = min(self._usage, key=self._usage.get, default=None)
+            if browser is None or (
+                self._usage[browser] >= self.max_contexts and len(self._usage) < self.max_browsers
+            ):
+                browser = factory()
+                self._usage[browser] = 0
+            self._usage[browser] += 1
+            return browser
+
+    async def release(self, browser: Any) -> None:
+        """Devolve o navegador ao pool, fechando-o quando nenhuma ferramenta o usa mais."""
+        async with self._lock:
+            remaining = self._usage.get(browser, 1) - 1
+            if remaining > 0:
+                self._usage[browser] = remaining
+                return
+            self._usage.pop(browser, None)
+        await browser.close()
+
+
+BROWSER_POOL = BrowserPool()
+
+# Cleanups agendados por __del__: o loop só guarda referências fracas às tasks,
+# então elas ficam aqui até terminar para não serem coletadas no meio da execução
+_CLEANUP_TASKS: "set[asyncio.Task]" = set()
+
+
+def has_document_tags(html: str) -> bool:
+    """Indica se o HTML contém as tags <html> e <body>"""
+    return HTML_TAG_PATTERN.search(html) is not None and BODY_TAG_PATTERN.search(html) is not None
+
+
 class BrowserUseTool(BaseTool):
     name: str = "browser_use"
     description: str = _BROWSER_DESCRIPTION
@@ -50,12 +334,14 @@ class BrowserUseTool(BaseTool):
                     "screenshot",
                     "get_html",
                     "get_text",
+                    "read_links",
                     "execute_js",
                     "scroll",
                     "switch_tab",
                     "new_tab",
                     "close_tab",
                     "refresh",
+                    "batch",
                 ],
                 "description": "The browser action to perform",
             },
@@ -80,6 +366,12 @@ class BrowserUseTool(BaseTool):
                 "type": "integer",
                 "description": "Tab ID for 'switch_tab' action",
             },
+            "actions": {
+                "type": "array",
+                "description": "Actions for 'batch', each an object with 'action' and its arguments, "
+                "e.g. [{\"action\": \"click\", \"index\": 3}, {\"action\": \"get_text\"}]",
+                "items": {"type": "object"},
+            },
         },
         "required": ["action"],
         "dependencies": {
@@ -90,13 +382,31 @@ class BrowserUseTool(BaseTool):
             "switch_tab": ["tab_id"],
             "new_tab": ["url"],
             "scroll": ["scroll_amount"],
+            "batch": ["actions"],
         },
     }
+    # Argumentos obrigatórios de cada ação, extraídos do schema uma única vez
+    ACTION_REQUIRED_ARGS: ClassVar[Dict[str, Tuple[str, ...]]] = {
+        action: tuple(args) for action, args in parameters["dependencies"].items()
+    }
 
-    lock: asyncio.Lock = Field(default_factory=asyncio.Lock)
-    browser: Optional[BrowserUseBrowser] = Field(default=None, exclude=True)
-    context: Optional[BrowserContext] = Field(default=None, exclude=True)
-    dom_service: Optional[DomService] = Field(default=None, exclude=True)
+    # Lock apenas da inicialização/encerramento do navegador, outro para o ciclo de vida das
+    # abas e um por aba para as ações que alteram a página; não há lock global, então ações
+    # em abas diferentes (e leituras) rodam em paralelo
+    _init_lock: asyncio.Lock = PrivateAttr(default_factory=asyncio.Lock)
+    _tab_lock: asyncio.Lock = PrivateAttr(default_factory=asyncio.Lock)
+    # Locks e DomServices ficam indexados pelo próprio objeto Page, com referências fracas: uma aba
+    # fechada por fora de _close_tab (popup, window.close()) sai sozinha, sem que uma página nova
+    # possa herdar a entrada dela (como aconteceria com um id reaproveitado)
+    _page_locks: "weakref.WeakKeyDictionary[Any, asyncio.Lock]" = PrivateAttr(default_factory=weakref.WeakKeyDictionary)
+    # BrowserUseBrowser e BrowserContext (tipados como Any para não importar o browser_use)
+    browser: Optional[Any] = Field(default=None, exclude=True)
+    context: Optional[Any] = Field(default=None, exclude=True)
+    # DomService de cada aba (criado na primeira vez que a aba é usada)
+    _dom_services: "weakref.WeakKeyDictionary[Any, Any]" = PrivateAttr(default_factory=weakref.WeakKeyDictionary)
+    # Lista de elementos interativos do último estado lido, pela assinatura (url, (índice, xpath)...)
+    # do selector_map desse estado; reaproveitada enquanto o estado novo tiver a mesma assinatura
+    _clickable_cache: Optional[Tuple[tuple, str]] = PrivateAttr(default=None)
 
     @field_validator("parameters", mode="before")
     def validate_parameters(cls, v: dict, info: ValidationInfo) -> dict:
@@ -104,49 +414,23 @@ class BrowserUseTool(BaseTool):
             raise ValueError("Parameters cannot be empty")
         return v
 
-    async def _ensure_browser_initialized(self) -> BrowserContext:
+    async def _ensure_browser_initialized(self) -> "BrowserContext":
         """Ensure browser and context are initialized."""
-        if self.browser is None:
-            browser_config_kwargs = {"headless": False}
+        # Caminho rápido: navegador já ativo, sem reler a configuração
+        if self.browser is not None and self.context is not None:
+            return self.context
 
-            if config.browser_config:
-                from browser_use.browser.browser import ProxySettings
+        async with self._init_lock:
+            # Verificar de novo sob o lock: outra chamada pode ter inicializado enquanto esperava
+            return await self._initialize_browser()
 
-                # handle proxy settings.
-                if config.browser_config.proxy and config.browser_config.proxy.server:
-                    browser_config_kwargs["proxy"] = ProxySettings(
-                        server=config.browser_config.proxy.server,
-                        username=config.browser_config.proxy.username,
-                        password=config.browser_config.proxy.password,
-                    )
+    async def _initialize_browser(self) -> "BrowserContext":
+        """Cria o navegador e o contexto que ainda não existirem (chamado sob o _init_lock)."""
+        from browser_use.browser.context import BrowserContextConfig
 
-                browser_attrs = [
-                    "headless",
-                    "disable_security",
-                    "extra_chromium_args",
-                    "chrome_instance_path",
-                    "wss_url",
-                    "cdp_url",
-                ]
-
-                for attr in browser_attrs:
-                    value = getattr(config.browser_config, attr, None)
-                    if value is not None:
-                        if not isinstance(value, list) or value:
-                            browser_config_kwargs[attr] = value
-
-            try:
-                self.browser = BrowserUseBrowser(BrowserConfig(**browser_config_kwargs))
-            except Exception as e:
-                logger.error(f"Erro ao inicializar o navegador: {str(e)}")
-                # Tente com argumento de segurança desativado
-                if "disable_security" not in browser_config_kwargs:
-                    browser_config_kwargs["disable_security"] = True
-                    try:
-                        self.browser = BrowserUseBrowser(BrowserConfig(**browser_config_kwargs))
-                        logger.info("Navegador inicializado com segurança desativada")
-                    except Exception as inner_e:
-                        raise RuntimeError(f"Não foi possível inicializar o navegador: {str(inner_e)}")
+        if self.browser is None:
+            # Navegador compartilhado com outras instâncias; cada ferramenta tem o próprio contexto
+            self.browser = await BROWSER_POOL.acquire(create_browser)
 
         if self.context is None:
             context_config = BrowserContextConfig()
@@ -160,10 +444,57 @@ class BrowserUseTool(BaseTool):
                 context_config = config.browser_config.new_context_config
 
             self.context = await self.browser.new_context(context_config)
-            self.dom_service = DomService(await self.context.get_current_page())
 
         return self.context
 
+    async def get_dom_service(self) -> "DomService":
+        """Retorna o DomService da aba atual, criando-o só na primeira vez que a aba é usada."""
+        from browser_use.dom.service import DomService
+
+        context = await self._ensure_browser_initialized()
+        page = await context.get_current_page()
+        # O DomService guarda a própria página, então sua entrada não sai sozinha: descartar as
+        # das abas já fechadas
+        for closed_page in [known for known in self._dom_services if known.is_closed()]:
+            del self._dom_services[closed_page]
+        dom_service = self._dom_services.get(page)
+        if dom_service is None:
+            dom_service = self._dom_services[page] = DomService(page)
+        return dom_service
+
+    async def _current_page_lock(self, context: "BrowserContext") -> asyncio.Lock:
+        """Retorna o lock da aba atual."""
+        page = await context.get_current_page()
+        lock = self._page_locks.get(page)
+        if lock is None:
+            lock = self._page_locks[page] = asyncio.Lock()
+        return lock
+
+    async def _wait_for_page_load(self, context: "BrowserContext") -> None:
+        """Aguarda o DOM da página atual ficar pronto (retorna na hora se já estiver)."""
+        try:
+            page = await context.get_current_page()
+            await page.wait_for_load_state("domcontentloaded", timeout=PAGE_LOAD_TIMEOUT_MS)
+        except Exception as e:
+            logger.debug(f"Espera pelo carregamento da página falhou: {str(e)}")
+
+    async def _navigate_with_status(self, context: "BrowserContext", url: str) -> Optional[int]:
+        """Navega até a URL e retorna o status HTTP da resposta do documento principal."""
+        page = await context.get_current_page()
+        statuses = []
+
+        def on_response(response) -> None:
+            # Redirecionamentos também geram respostas: vale a última do frame principal
+            if response.frame == page.main_frame and response.request.is_navigation_request():
+                statuses.append(response.status)
+
+        page.on("response", on_response)
+        try:
+            await context.navigate_to(url)
+        finally:
+            page.remove_listener("response", on_response)
+        return statuses[-1] if statuses else None
+
     async def execute(
         self,
         action: str,
@@ -173,6 +504,7 @@ class BrowserUseTool(BaseTool):
         script: Optional[str] = None,
         scroll_amount: Optional[int] = None,
         tab_id: Optional[int] = None,
+        actions: Optional[List[Dict[str, Any]]] = None,
         **kwargs,
     ) -> ToolResult:
         """
@@ -186,426 +518,409 @@ class BrowserUseTool(BaseTool):
             script: JavaScript code for execution
             scroll_amount: Pixels to scroll for scroll action
             tab_id: Tab ID for switch_tab action
+            actions: Actions to run in order for the batch action
             **kwargs: Additional arguments
 
         Returns:
             ToolResult with the action's output or error
         """
-        async with self.lock:
-            try:
-                context = await self._ensure_browser_initialized()
-                
-                # Detectar padrao incorreto comum (url em get_html)
-                if action == "get_html" and url:
-                    # Uso incorreto detectado, fazer navegação primeiro
-                    logger.warning(f"Detected incorrect usage pattern! Automatically navigating to {url} before get_html")
-                    await context.navigate_to(url)
-                    await asyncio.sleep(2)  # Dar tempo para carregar
-
-                if action == "navigate":
-                    if not url:
-                        return ToolResult(error="URL is required for 'navigate' action")
-                    try:
-                        await context.navigate_to(url)
-                        # Verificar se a navegação retornou 404 ou erro de conexão
-                        status_code = await context.execute_javascript(
-                            """(function() {
-                                // Verificar se existe propriedade performanceEntries
-                                if (window.performance && window.performance.getEntries) {
-                                    const entries = window.performance.getEntries();
-                                    for (const entry of entries) {
-                                        if (entry.name === window.location.href) {
-                                            return entry.responseStatus || 200;
-                                        }
-                                    }
-                                }
-                                // Verificar status com base no conteúdo da página
-                                if (document.title.includes('404') || 
-                                    document.body.textContent.includes('not found') ||
-                                    document.body.textContent.includes('404') ||
-                                    document.body.textContent.includes('não encontrada')) {
-                                    return 404;
-                                }
-                                return 200;
-                            })();"""
-                        )
-                        
-                        if status_code == 404:
-                            error_msg = f"❌ URL INVÁLIDA: {url} retornou erro 404 (página não encontrada). Por favor revise os resultados da busca e escolha outra URL válida."
-                            logger.warning(error_msg)
-                            return ToolResult(error=error_msg)
-                            
-                        return ToolResult(output=f"Navigated to {url}")
-                    except Exception as e:
-                        error_msg = f"Error navigating to {url}: {str(e)}"
-                        # Erro específico para URLs inválidas
-                        if "404" in str(e) or "ERR_NAME_NOT_RESOLVED" in str(e) or "net::ERR" in str(e):
-                            error_msg = f"❌ URL INVÁLIDA: {url} não existe ou está inacessível. Por favor revise os resultados da busca e escolha outra URL válida."
-                        logger.warning(error_msg)
-                        return ToolResult(error=error_msg)
-
-                elif action == "click":
-                    if index is None:
-                        return ToolResult(error="Index is required for 'click' action")
-                    element = await context.get_dom_element_by_index(index)
-                    if not element:
-                        return ToolResult(error=f"Element with index {index} not found")
-                    download_path = await context._click_element_node(element)
-                    output = f"Clicked element at index {index}"
-                    if download_path:
-                        output += f" - Downloaded file to {download_path}"
-                    return ToolResult(output=output)
-
-                elif action == "input_text":
-                    if index is None or not text:
-                        return ToolResult(
-                            error="Index and text are required for 'input_text' action"
-                        )
-                    element = await context.get_dom_element_by_index(index)
-                    if not element:
-                        return ToolResult(error=f"Element with index {index} not found")
-                    await context._input_text_element_node(element, text)
-                    return ToolResult(
-                        output=f"Input '{text}' into element at index {index}"
-                    )
-
-                elif action == "screenshot":
-                    screenshot = await context.take_screenshot(full_page=True)
-                    return ToolResult(
-                        output=f"Screenshot captured (base64 length: {len(screenshot)})",
-                        system=screenshot,
-                    )
+        arguments = {
+            "url": url, "index": index, "text": text, "script": script,
+            "scroll_amount": scroll_amount, "tab_id": tab_id, "actions": actions,
+        }
+        missing = [
+            name for name in self.ACTION_REQUIRED_ARGS.get(action, ())
+            if arguments[name] is None or arguments[name] == ""
+        ]
+        if missing:
+            # Validado antes de iniciar o navegador
+            return ToolResult(error=f"Missing required argument(s) for '{action}' action: {', '.join(missing)}")
+        if action == "batch":
+            return await self._run_batch(actions)
 
-                elif action == "get_html":
-                    try:
-                        # Proteger com timeout para evitar bloqueio indefinido
-                        async def get_html_with_timeout(self, timeout=30):
-                            # Dar tempo para a página carregar completamente
-                            await asyncio.sleep(5)
-                            
-                            # Lista para armazenar resultados de diferentes métodos
-                            html_results = []
-                            error_messages = []
-                            
-                            # Aumentado o limite máximo de caracteres para evitar truncamento
-                            MAX_LENGTH = 250000
-                            
-                            # Tentativa 1: Método padrão via browser_use
-                            try:
-                                html = await context.get_page_html()
-                                if html and len(html) > 100 and "<body></body>" not in html:
-                                    html_results.append(("standard", html))
-                            except Exception as e:
-                                error_messages.append(f"Standard method failed: {str(e)}")
-                            
-                            # Tentativa 2: Via JavaScript document.documentElement.outerHTML
-                            try:
-                                js_html = await context.execute_javascript("document.documentElement.outerHTML")
-                                if js_html and len(js_html) > 100:
-                                    html_results.append(("javascript_outerhtml", js_html))
-                            except Exception as e:
-                                error_messages.append(f"JavaScript outerHTML method failed: {str(e)}")
-                            
-                            # Tentativa 3: Via JavaScript innerHTML
-                            try:
-                                js_inner_html = await context.execute_javascript("document.body.innerHTML")
-                                if js_inner_html and len(js_inner_html) > 100:
-                                    wrapped_html = f"<html><body>{js_inner_html}</body></html>"
-                                    html_results.append(("javascript_innerhtml", wrapped_html))
-                            except Exception as e:
-                                error_messages.append(f"JavaScript innerHTML method failed: {str(e)}")
-                            
-                            # Nova tentativa: Obter HTML serializado via API do Chrome
-                            try:
-                                serialized_html = await context.execute_javascript("""
-                                    (function() {
-                                        try {
-                                            let parser = new DOMParser();
-                                            let serializer = new XMLSerializer();
-                                            let doc = parser.parseFromString(document.documentElement.outerHTML, "text/html");
-                                            return serializer.serializeToString(doc);
-                                        } catch(e) {
-                                            return "Error: " + e.message;
-                                        }
-                                    })()
-                                """)
-                                
-                                if serialized_html and len(serialized_html) > 100 and not serialized_html.startswith("Error:"):
-                                    html_results.append(("serialized", serialized_html))
-                            except Exception as e:
-                                error_messages.append(f"Serialization method failed: {str(e)}")
-                            
-                            # Tentativa 4: Extrair apenas o texto se outros métodos falharem
-                            try:
-                                text_content = await context.execute_javascript("""
-                                    (function() {
-                                        const textNodes = [];
-                                        const walk = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
-                                        let node;
-                                        while(node = walk.nextNode()) {
-                                            if (node.textContent.trim().length > 0) {
-                                                textNodes.push(node.textContent.trim());
-                                            }
-                                        }
-                                        return textNodes.join('\n');
-                                    })()
-                                """)
-                                
-                                if text_content and len(text_content) > 50:
-                                    formatted_text = f"<html><body><pre>{text_content}</pre></body></html>"
-                                    html_results.append(("text_content", formatted_text))
-                            except Exception as e:
-                                error_messages.append(f"Text extraction method failed: {str(e)}")
-                            
-                            # Selecionar o melhor resultado baseado no tamanho e qualidade
-                            if html_results:
-                                # Verificar se algum resultado contém as tags html e body
-                                complete_results = [r for r in html_results if r[1] and "<html" in r[1].lower() and "<body" in r[1].lower()]
-                                
-                                # Priorizar resultados completos, ou usar todos se não houver completos
-                                results_to_use = complete_results if complete_results else html_results
-                                
-                                # Ordenar por tamanho (do maior para o menor)
-                                results_to_use.sort(key=lambda x: len(x[1]), reverse=True)
-                                method, html = results_to_use[0]
-                                
-                                # Registrar sucesso e detalhes para diagnóstico
-                                logger.info(f"HTML extraction successful using '{method}' method ({len(html)} characters)")
-                                logger.info(f"HTML inicia com: {html[:100].replace('\n', ' ')}...")
-                                
-                                # Verificar a qualidade do HTML
-                                has_html_tag = "<html" in html.lower()
-                                has_body_tag = "<body" in html.lower()
-                                has_content = len(html) > 1000
-                                
-                                logger.info(f"Qualidade do HTML - Tags HTML: {has_html_tag}, Tags Body: {has_body_tag}, Tamanho adequado: {has_content}")
-                                
-                                # Truncar se necessário, mas preservar um tamanho muito maior
-                                if len(html) > MAX_LENGTH:
-                                    truncated = html[:MAX_LENGTH] + f"\n... (content truncated, total: {len(html)} characters)"
-                                else:
-                                    truncated = html
-                                    
-                                return ToolResult(output=truncated)
-                            else:
-                                # Fallback: registrar o erro e recomendar tentar outra URL
-                                error_summary = "\n".join(error_messages)
-                                logger.warning(f"All HTML extraction attempts failed: {error_summary}")
-                                
-                                # Criar um HTML informativo em vez de retornar apenas um erro
-                                fallback_html = f"""
-                                <html>
-                                <body>
-                                <h1>⚠️ Erro na extração do conteúdo</h1>
-                                <p>Não foi possível obter o conteúdo HTML desta página. Isso pode ocorrer por vários motivos:</p>
-                                <ul>
-                                    <li>O site usa técnicas anti-scraping</li>
-                                    <li>O site requer interação do usuário (login ou CAPTCHA)</li>
-                                    <li>Problemas de conexão ou timeout</li>
-                                    <li>Conteúdo dinâmico que requer JavaScript</li>
-                                </ul>
-                                <p><strong>Recomendação:</strong> Tente acessar outra URL dos resultados da busca.</p>
-                                <p><strong>IMPORTANTE:</strong> Você deve tentar com uma das outras URLs retornadas pelo comando web_search. Use o comando browser_use com action=navigate para acessar outra URL da lista.</p>
-                                </body>
-                                </html>
-                                """
-                                
-                                # Retornar o HTML de fallback com um código de erro especial para sinalizar ao agente
-                                logger.error("HTML_EXTRACTION_ERROR: Tentando próxima URL dos resultados da busca...")
-                                return ToolResult(output=fallback_html, error="HTML_EXTRACTION_ERROR: Tente outra URL dos resultados")
-                                
-                        # Executar a função de extração de HTML com timeout
-                        html_task = asyncio.create_task(get_html_with_timeout(self))
-                        return await asyncio.wait_for(html_task, timeout=30)  # 30 segundos máximo
-                        
-                    except asyncio.TimeoutError:
-                        # Timeout atingido, retornar mensagem informativa
-                        logger.error("TIMEOUT: A extração de HTML excedeu o limite de tempo (30s)")
-                        fallback_html = f"""
-                        <html>
-                        <body>
-                        <h1>⚠️ Erro: Timeout na extração</h1>
-                        <p>Não foi possível extrair o HTML desta página dentro do tempo limite (30 segundos).</p>
-                        <p>Isso geralmente ocorre em páginas muito complexas ou com problemas de carregamento.</p>
-                        <p><strong>Solução recomendada:</strong> Tente uma das seguintes opções:</p>
-                        <ol>
-                            <li>Use o comando browser_use com action=get_text para extrair apenas o texto da página atual</li>
-                            <li>Tente acessar outra URL dos resultados da pesquisa</li>
-                        </ol>
-                        </body>
-                        </html>
-                        """
-                        return ToolResult(output=fallback_html, error="Timeout na extração de HTML após 30 segundos")
-                    except Exception as e:
-                        # Erro geral, informar o usuário
-                        logger.error(f"Erro na extração de HTML: {str(e)}")
-                        error_html = f"""
-                        <html>
-                        <body>
-                        <h1>❌ Erro na extração de HTML</h1>
-                        <p>Ocorreu um erro ao tentar extrair o HTML desta página:</p>
-                        <pre>{str(e)}</pre>
-                        <p>Tente usar action=get_text como alternativa, ou acesse outra URL dos resultados.</p>
-                        </body>
-                        </html>
-                        """
-                        return ToolResult(output=error_html, error=f"Erro na extração de HTML: {str(e)}")
-
-                elif action == "get_text":
-                    await asyncio.sleep(2)  # Dar tempo para carregar
-                    try:
-                        # Versão corrigida do JavaScript para extrair texto de forma mais robusta
-                        fixed_js = """
-                        (function() {
-                            try {
-                                // Função para obter texto visível de forma mais robusta
-                                function extractVisibleText() {
-                                    const textParts = [];
-                                    
-                                    // Selecionar elementos comuns de texto
-                                    const selectors = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'td', 'th', 'div:not(:has(*))', 'span:not(:has(*))'];
-                                    
-                                    for (let i = 0; i < selectors.length; i++) {
-                                        try {
-                                            const elements = document.querySelectorAll(selectors[i]);
-                                            for (let j = 0; j < elements.length; j++) {
-                                                try {
-                                                    const el = elements[j];
-                                                    // Verificar se o elemento é visível
-                                                    const style = window.getComputedStyle(el);
-                                                    if (style.display !== 'none' && style.visibility !== 'hidden') {
-                                                        const text = el.innerText || el.textContent;
-                                                        if (text && text.trim().length > 0) {
-                                                            textParts.push(text.trim());
-                                                        }
-                                                    }
-                                                } catch (elementError) {
-                                                    // Ignorar erros em elementos específicos
-                                                }
-                                            }
-                                        } catch (selectorError) {
-                                            // Ignorar erros em seletores específicos
-                                        }
-                                    }
-                                    
-                                    return textParts.join('\n');
-                                }
-                                
-                                // Tentar extrair texto com método mais seguro
-                                const extractedText = extractVisibleText();
-                                if (extractedText && extractedText.length > 0) {
-                                    return extractedText;
-                                }
-                                
-                                // Fallbacks sequenciais
-                                if (document.body.innerText && document.body.innerText.length > 0) {
-                                    return document.body.innerText;
-                                }
-                                
-                                if (document.body.textContent && document.body.textContent.length > 0) {
-                                    return document.body.textContent;
-                                }
-                                
-                                return 'Nenhum texto extraído';
-                            } catch (e) {
-                                return 'Erro na extração de texto: ' + e.message;
-                            }
-                        })();
-                        """
-                        
-                        # Executar o JavaScript corrigido
-                        text = await context.execute_javascript(fixed_js)
-                        
-                        # Verificar se foi obtido um resultado válido
-                        if not text or text.startswith('Erro na extração'):
-                            logger.warning(f"Problema na extração de texto: {text}")
-                            # Tentar método alternativo como fallback
-                            try:
-                                simple_js = "document.body.textContent.replace(/\\s+/g, ' ').trim()"
-                                text = await context.execute_javascript(simple_js)
-                            except Exception as inner_e:
-                                logger.warning(f"Fallback também falhou: {str(inner_e)}")
-                                return ToolResult(error=f"Falha na extração de texto: {text}")
-                            
-                        # Limpar e formatar o texto
-                        cleaned_text = text.replace('\t', ' ').replace('\r', '').replace('\n\n\n', '\n\n')
-                        
-                        return ToolResult(output=cleaned_text[:MAX_LENGTH] if len(cleaned_text) > MAX_LENGTH else cleaned_text)
-                    except Exception as e:
-                        error_msg = f"Falha ao extrair texto: {str(e)}"
-                        logger.error(error_msg)
-                        return ToolResult(error=error_msg)
+        try:
+            context = await self._ensure_browser_initialized()
 
-                elif action == "read_links":
-                    links = await context.execute_javascript(
-                        "document.querySelectorAll('a[href]').forEach((elem) => {if (elem.innerText) {console.log(elem.innerText, elem.href)}})"
+            if action in TAB_ACTIONS:
+                async with self._tab_lock:
+                    return await self._run_action(
+                        context, action, url, index, text, script, scroll_amount, tab_id
                     )
-                    return ToolResult(output=links)
-
-                elif action == "execute_js":
-                    if not script:
-                        return ToolResult(
-                            error="Script is required for 'execute_js' action"
+            if action in ("get_html", "get_text") and url:
+                # Extração com url troca a página da aba atual: navegar e extrair sem que a
+                # aba atual mude nem a página seja alterada no meio (usado pelo fetch_page)
+                async with self._tab_lock:
+                    async with await self._current_page_lock(context):
+                        return await self._run_action(
+                            context, action, url, index, text, script, scroll_amount, tab_id
                         )
-                    result = await context.execute_javascript(script)
-                    return ToolResult(output=str(result))
-
-                elif action == "scroll":
-                    if scroll_amount is None:
-                        return ToolResult(
-                            error="Scroll amount is required for 'scroll' action"
-                        )
-                    await context.execute_javascript(
-                        f"window.scrollBy(0, {scroll_amount});"
-                    )
-                    direction = "down" if scroll_amount > 0 else "up"
-                    return ToolResult(
-                        output=f"Scrolled {direction} by {abs(scroll_amount)} pixels"
+            if action in PAGE_ACTIONS:
+                async with await self._current_page_lock(context):
+                    return await self._run_action(
+                        context, action, url, index, text, script, scroll_amount, tab_id
                     )
+            return await self._run_action(
+                context, action, url, index, text, script, scroll_amount, tab_id
+            )
+        except Exception as e:
+            return ToolResult(error=f"Browser action '{action}' failed: {str(e)}")
+
+    async def _run_batch(self, actions: List[Dict[str, Any]]) -> ToolResult:
+        """Executa as ações em sequência numa só chamada, parando no primeiro erro."""
+        if not isinstance(actions, list):
+            return ToolResult(error="'actions' must be a list for 'batch' action")
+
+        outputs = []
+        system = None
+        for i, step in enumerate(actions, start=1):
+            name = step.get("action") if isinstance(step, dict) else None
+            if not name or name == "batch":
+                result = ToolResult(error="each batch item needs an 'action' other than 'batch'")
+            else:
+                result = await self.execute(**step)
+            if result.error:
+                outputs.append(f"[{i}] {name}: Error: {result.error}")
+                if i < len(actions):
+                    outputs.append(f"Skipped the remaining {len(actions) - i} action(s)")
+                return ToolResult(error="\n\n".join(outputs), system=system)
+            outputs.append(f"[{i}] {name}: {result.output}")
+            system = result.system or system
+        return ToolResult(output="\n\n".join(outputs), system=system)
+
+    async def _run_action(
+        self,
+        context: "BrowserContext",
+        action: str,
+        url: Optional[str],
+        index: Optional[int],
+        text: Optional[str],
+        script: Optional[str],
+        scroll_amount: Optional[int],
+        tab_id: Optional[int],
+    ) -> ToolResult:
+        """Executa uma ação no contexto já inicializado."""
+        handler = self.ACTION_HANDLERS.get(action)
+        if handler is None:
+            return ToolResult(error=f"Unknown action: {action}")
+
+        # Extração com url: navegar primeiro
+        if action in ("get_html", "get_text") and url:
+            logger.info(f"Navigating to {url} before {action}")
+            # get_html/get_text aguardam o carregamento da página logo em seguida
+            await context.navigate_to(url)
+
+        return await handler(
+            self,
+            context,
+            url=url,
+            index=index,
+            text=text,
+            script=script,
+            scroll_amount=scroll_amount,
+            tab_id=tab_id,
+        )
+
+    async def _navigate(self, context: "BrowserContext", url: Optional[str] = None, **kwargs) -> ToolResult:
+        """Navega até a URL, verificando se a página existe."""
+        try:
+            # Verificar se a navegação retornou 404: status da resposta HTTP principal,
+            # ou o conteúdo da página quando o status não foi observado
+            status_code = await self._navigate_with_status(context, url)
+            if status_code is None:
+                status_code = await context.execute_javascript(JS_SOFT_404_CHECK)
+            
+            if status_code == 404:
+                error_msg = f"❌ URL INVÁLIDA: {url} retornou erro 404 (página não encontrada). Por favor revise os resultados da busca e escolha outra URL válida."
+                logger.warning(error_msg)
+                return ToolResult(error=error_msg)
+                
+            return ToolResult(output=f"Navigated to {url}")
+        except Exception as e:
+            error_msg = f"Error navigating to {url}: {str(e)}"
+            # Erro específico para URLs inválidas
+            if "404" in str(e) or "ERR_NAME_NOT_RESOLVED" in str(e) or "net::ERR" in str(e):
+                error_msg = f"❌ URL INVÁLIDA: {url} não existe ou está inacessível. Por favor revise os resultados da busca e escolha outra URL válida."
+            logger.warning(error_msg)
+            return ToolResult(error=error_msg)
+
+    async def _click(self, context: "BrowserContext", index: Optional[int] = None, **kwargs) -> ToolResult:
+        """Clica no elemento indicado pelo índice."""
+        element = await context.get_dom_element_by_index(index)
+        if not element:
+            return ToolResult(error=f"Element with index {index} not found")
+        download_path = await context._click_element_node(element)
+        output = f"Clicked element at index {index}"
+        if download_path:
+            output += f" - Downloaded file to {download_path}"
+        return ToolResult(output=output)
+
+    async def _input_text(
+        self, context: "BrowserContext", index: Optional[int] = None, text: Optional[str] = None, **kwargs
+    ) -> ToolResult:
+        """Digita o texto no elemento indicado pelo índice."""
+        element = await context.get_dom_element_by_index(index)
+        if not element:
+            return ToolResult(error=f"Element with index {index} not found")
+        await context._input_text_element_node(element, text)
+        return ToolResult(
+            output=f"Input '{text}' into element at index {index}"
+        )
+
+    async def _screenshot(self, context: "BrowserContext", **kwargs) -> ToolResult:
+        """Captura a página inteira."""
+        screenshot = await context.take_screenshot(full_page=True)
+        return ToolResult(
+            output=f"Screenshot captured (base64 length: {len(screenshot)})",
+            system=screenshot,
+        )
+
+    async def _cdp_outer_html(self, context: "BrowserContext") -> str:
+        """Obtém o HTML do documento pelo domínio DOM do CDP (apenas Chromium)."""
+        page = await context.get_current_page()
+        session = await page.context.new_cdp_session(page)
+        try:
+            document = await session.send("DOM.getDocument", {"depth": 0})
+            result = await session.send("DOM.getOuterHTML", {"nodeId": document["root"]["nodeId"]})
+            return result["outerHTML"]
+        finally:
+            await session.detach()
+
+    async def _extract_html(self, context: "BrowserContext") -> ToolResult:
+        """Extrai o HTML da página atual pelo melhor entre os métodos disponíveis."""
+        # Aguardar o carregamento do DOM em vez de uma pausa fixa
+        await self._wait_for_page_load(context)
+        
+        # Lista para armazenar resultados de diferentes métodos
+        html_results = []
+        error_messages = []
+        
+        # Tamanho original de cada resultado (os scripts já devolvem o HTML cortado)
+        total_lengths = {}
 
-                elif action == "switch_tab":
-                    if tab_id is None:
-                        return ToolResult(
-                            error="Tab ID is required for 'switch_tab' action"
-                        )
-                    await context.switch_to_tab(tab_id)
-                    return ToolResult(output=f"Switched to tab {tab_id}")
-
-                elif action == "new_tab":
-                    if not url:
-                        return ToolResult(error="URL is required for 'new_tab' action")
-                    await context.create_new_tab(url)
-                    return ToolResult(output=f"Opened new tab with URL {url}")
-
-                elif action == "close_tab":
-                    await context.close_current_tab()
-                    return ToolResult(output="Closed current tab")
-
-                elif action == "refresh":
-                    await context.refresh_page()
-                    return ToolResult(output="Refreshed current page")
+        # Método principal: DOM.getOuterHTML direto pelo CDP, sem passar pelo Runtime.evaluate
+        try:
+            cdp_html = await self._cdp_outer_html(context)
+            if cdp_html and len(cdp_html) > 100 and has_document_tags(cdp_html):
+                html_results.append(("cdp_outerhtml", cdp_html))
+                total_lengths["cdp_outerhtml"] = len(cdp_html)
+        except Exception as e:
+            error_messages.append(f"Method 'cdp_outerhtml' failed: {str(e)}")
+
+        if not html_results:
+            # Alternativas: todos os métodos via JavaScript em paralelo (as chamadas ao CDP se
+            # sobrepõem em vez de se somarem); os resultados são avaliados depois
+            results = await asyncio.gather(
+                context.get_page_html(),
+                context.execute_javascript(JS_OUTER_HTML),
+                context.execute_javascript(JS_INNER_HTML),
+                context.execute_javascript(JS_SERIALIZED_HTML),
+                context.execute_javascript(JS_TEXT_NODES),
+                return_exceptions=True,
+            )
+            for method, result in zip(HTML_EXTRACTION_METHODS, results):
+                if isinstance(result, dict):
+                    total_lengths[method] = result.get("length", 0)
+                    result = result.get("html")
+                elif isinstance(result, str):
+                    total_lengths[method] = len(result)
+                if isinstance(result, BaseException):
+                    error_messages.append(f"Method '{method}' failed: {str(result)}")
+                elif not result or not isinstance(result, str):
+                    continue
+                elif method == "standard":
+                    if len(result) > 100 and "<body></body>" not in result:
+                        html_results.append((method, result))
+                elif method == "javascript_innerhtml":
+                    if len(result) > 100:
+                        html_results.append((method, f"<html><body>{result}</body></html>"))
+                elif method == "serialized":
+                    if len(result) > 100 and not result.startswith("Error:"):
+                        html_results.append((method, result))
+                elif method == "text_content":
+                    # Apenas o texto, caso os outros métodos falhem
+                    if len(result) > 50:
+                        html_results.append((method, f"<html><body><pre>{result}</pre></body></html>"))
+                elif len(result) > 100:
+                    html_results.append((method, result))
+        
+        # Selecionar o melhor resultado baseado no tamanho e qualidade
+        if html_results:
+            # Verificar se algum resultado contém as tags html e body
+            complete_results = [r for r in html_results if has_document_tags(r[1])]
+            
+            # Priorizar resultados completos, ou usar todos se não houver completos
+            results_to_use = complete_results if complete_results else html_results
+            
+            # Ordenar por tamanho (do maior para o menor)
+            results_to_use.sort(key=lambda x: total_lengths[x[0]], reverse=True)
+            method, html = results_to_use[0]
+            total_length = max(total_lengths[method], len(html))
+            
+            # Registrar sucesso e detalhes para diagnóstico
+            logger.info(f"HTML extraction successful using '{method}' method ({total_length} characters)")
+            logger.info(f"HTML inicia com: {html[:100].replace('\n', ' ')}...")
+            
+            # Verificar a qualidade do HTML (sem cópias em minúsculas do documento inteiro)
+            has_html_tag = HTML_TAG_PATTERN.search(html) is not None
+            has_body_tag = BODY_TAG_PATTERN.search(html) is not None
+            has_content = len(html) > 1000
+            
+            logger.info(f"Qualidade do HTML - Tags HTML: {has_html_tag}, Tags Body: {has_body_tag}, Tamanho adequado: {has_content}")
+            
+            # Truncar se necessário, mas preservar um tamanho muito maior
+            if total_length > MAX_HTML_LENGTH:
+                truncated = html[:MAX_HTML_LENGTH] + f"\n... (content truncated, total: {total_length} characters)"
+            else:
+                truncated = html
+                
+            return ToolResult(output=truncated)
+        else:
+            # Fallback: registrar o erro e recomendar tentar outra URL
+            error_summary = "\n".join(error_messages)
+            logger.warning(f"All HTML extraction attempts failed: {error_summary}")
+            
+            # Retornar um HTML informativo com um código de erro especial para sinalizar ao agente
+            logger.error("HTML_EXTRACTION_ERROR: Tentando próxima URL dos resultados da busca...")
+            return ToolResult(output=EXTRACTION_FAILED_HTML, error="HTML_EXTRACTION_ERROR: Tente outra URL dos resultados")
+
+    async def _get_html(self, context: "BrowserContext", **kwargs) -> ToolResult:
+        """Extrai o HTML da página atual."""
+        try:
+            # Executar a extração de HTML com timeout (30 segundos máximo) para evitar bloqueio indefinido
+            async with asyncio.timeout(30):
+                return await self._extract_html(context)
+            
+        except TimeoutError:
+            # Timeout atingido, retornar mensagem informativa
+            logger.error("TIMEOUT: A extração de HTML excedeu o limite de tempo (30s)")
+            return ToolResult(output=EXTRACTION_TIMEOUT_HTML, error="Timeout na extração de HTML após 30 segundos")
+        except Exception as e:
+            # Erro geral, informar o usuário
+            logger.error(f"Erro na extração de HTML: {str(e)}")
+            return ToolResult(output=EXTRACTION_ERROR_HTML_TEMPLATE.format(error=e), error=f"Erro na extração de HTML: {str(e)}")
 
-                else:
-                    return ToolResult(error=f"Unknown action: {action}")
+    async def _get_text(self, context: "BrowserContext", **kwargs) -> ToolResult:
+        """Extrai o texto visível da página atual."""
+        await self._wait_for_page_load(context)
+        try:
+            # Extrair o texto visível da página
+            text = await context.execute_javascript(JS_VISIBLE_TEXT)
+            
+            # Verificar se foi obtido um resultado válido
+            if not text or text.startswith('Erro na extração'):
+                logger.warning(f"Problema na extração de texto: {text}")
+                # Tentar método alternativo como fallback
+                try:
+                    text = await context.execute_javascript(JS_TEXT_CONTENT)
+                except Exception as inner_e:
+                    logger.warning(f"Fallback também falhou: {str(inner_e)}")
+                    return ToolResult(error=f"Falha na extração de texto: {text}")
+                
+            # Limpar e formatar o texto
+            cleaned_text = text.replace('\t', ' ').replace('\r', '').replace('\n\n\n', '\n\n')
+            
+            return ToolResult(output=cleaned_text[:MAX_TEXT_LENGTH] if len(cleaned_text) > MAX_TEXT_LENGTH else cleaned_text)
+        except Exception as e:
+            error_msg = f"Falha ao extrair texto: {str(e)}"
+            logger.error(error_msg)
+            return ToolResult(error=error_msg)
+
+    async def _read_links(self, context: "BrowserContext", **kwargs) -> ToolResult:
+        """Lista os links da página atual."""
+        links = await context.execute_javascript(JS_READ_LINKS)
+        if not links:
+            return ToolResult(output="No links found on the current page")
+        return ToolResult(output="\n".join(f"{text}: {href}" for text, href in links))
+
+    async def _execute_js(self, context: "BrowserContext", script: Optional[str] = None, **kwargs) -> ToolResult:
+        """Executa o JavaScript na página atual."""
+        result = await context.execute_javascript(script)
+        return ToolResult(output=str(result))
+
+    async def _scroll(self, context: "BrowserContext", scroll_amount: Optional[int] = None, **kwargs) -> ToolResult:
+        """Rola a página pelo número de pixels indicado."""
+        # Evento de roda do mouse via CDP (Input.dispatchMouseEvent), sem compilar JavaScript.
+        # A roda rola o elemento sob o cursor: o mouse vai antes para o centro da janela
+        page = await context.get_current_page()
+        viewport = page.viewport_size
+        if viewport is None:
+            # Contexto sem viewport fixo (no_viewport): medir a janela real
+            width, height = await page.evaluate("[window.innerWidth, window.innerHeight]")
+        else:
+            width, height = viewport["width"], viewport["height"]
+        await page.mouse.move(width / 2, height / 2)
+        await page.mouse.wheel(0, scroll_amount)
+        direction = "down" if scroll_amount > 0 else "up"
+        return ToolResult(
+            output=f"Scrolled {direction} by {abs(scroll_amount)} pixels"
+        )
+
+    async def _switch_tab(self, context: "BrowserContext", tab_id: Optional[int] = None, **kwargs) -> ToolResult:
+        """Muda para a aba indicada."""
+        await context.switch_to_tab(tab_id)
+        return ToolResult(output=f"Switched to tab {tab_id}")
+
+    async def _new_tab(self, context: "BrowserContext", url: Optional[str] = None, **kwargs) -> ToolResult:
+        """Abre a URL em uma nova aba."""
+        await context.create_new_tab(url)
+        return ToolResult(output=f"Opened new tab with URL {url}")
+
+    async def _close_tab(self, context: "BrowserContext", **kwargs) -> ToolResult:
+        """Fecha a aba atual."""
+        page = await context.get_current_page()
+        await context.close_current_tab()
+        self._dom_services.pop(page, None)
+        self._page_locks.pop(page, None)
+        return ToolResult(output="Closed current tab")
+
+    async def _refresh(self, context: "BrowserContext", **kwargs) -> ToolResult:
+        """Recarrega a página atual."""
+        await context.refresh_page()
+        return ToolResult(output="Refreshed current page")
+
+    # Ação -> método que a executa (despacho por dicionário em vez de uma cadeia de elif)
+    ACTION_HANDLERS: ClassVar[Dict[str, Callable[..., Awaitable[ToolResult]]]] = {
+        "navigate": _navigate,
+        "click": _click,
+        "input_text": _input_text,
+        "screenshot": _screenshot,
+        "get_html": _get_html,
+        "get_text": _get_text,
+        "read_links": _read_links,
+        "execute_js": _execute_js,
+        "scroll": _scroll,
+        "switch_tab": _switch_tab,
+        "new_tab": _new_tab,
+        "close_tab": _close_tab,
+        "refresh": _refresh,
+    }
 
-            except Exception as e:
-                return ToolResult(error=f"Browser action '{action}' failed: {str(e)}")
+    def _clickable_elements(self, state: Any) -> str:
+        """Texto dos elementos interativos, recalculado só quando os elementos do estado mudam."""
+        # Derivada do estado recém-lido: mudanças feitas fora da ferramenta também invalidam o cache
+        signature = (state.url, tuple((index, node.xpath) for index, node in state.selector_map.items()))
+        if self._clickable_cache is not None and self._clickable_cache[0] == signature:
+            return self._clickable_cache[1]
+        clickable = state.element_tree.clickable_elements_to_string()
+        self._clickable_cache = (signature, clickable)
+        return clickable
 
     async def get_current_state(self) -> ToolResult:
         """Get the current browser state as a ToolResult."""
-        async with self.lock:
-            try:
-                context = await self._ensure_browser_initialized()
-                state = await context.get_state()
-                state_info = {
-                    "url": state.url,
-                    "title": state.title,
-                    "tabs": [tab.model_dump() for tab in state.tabs],
-                    "interactive_elements": state.element_tree.clickable_elements_to_string(),
-                }
-                return ToolResult(output=json.dumps(state_info))
-            except Exception as e:
-                return ToolResult(error=f"Failed to get browser state: {str(e)}")
+        try:
+            context = await self._ensure_browser_initialized()
+            state = await context.get_state()
+            state_info = {
+                "url": state.url,
+                "title": state.title,
+                # Apenas os campos usados, sem passar pelo model_dump de cada aba
+                "tabs": [{"page_id": tab.page_id, "url": tab.url, "title": tab.title} for tab in state.tabs],
+                "interactive_elements": self._clickable_elements(state),
+            }
+            # O texto serializado vai para o LLM; o dict fica disponível sem novo parse
+            return ToolResult(output=json_dumps(state_info), data=state_info)
+        except Exception as e:
+            return ToolResult(error=f"Failed to get browser state: {str(e)}")
 
     async def cleanup(self):
         """Clean up browser resources."""
@@ -614,58 +929,43 @@ class BrowserUseTool(BaseTool):
         
         logger.info("Iniciando cleanup do browser...")
         try:
-            async with self.lock:
+            async with self._init_lock:
                 # Fechar o contexto primeiro
                 if self.context is not None:
                     try:
                         logger.info("Fechando contexto do browser...")
                         await self.context.close()
                         self.context = None
-                        self.dom_service = None
+                        self._dom_services.clear()
+                        self._page_locks.clear()
                         logger.info("Contexto do browser fechado com sucesso.")
                     except Exception as e:
                         logger.error(f"Erro ao fechar o contexto do browser: {e}")
                 
-                # Depois fechar o browser
+                # Depois devolver o browser ao pool (fechado quando não houver mais usuários)
                 if self.browser is not None:
                     try:
-                        logger.info("Fechando instância do browser...")
-                        await self.browser.close()
+                        logger.info("Liberando instância do browser...")
+                        await BROWSER_POOL.release(self.browser)
                         self.browser = None
-                        logger.info("Instância do browser fechada com sucesso.")
+                        logger.info("Instância do browser liberada com sucesso.")
                     except Exception as e:
                         logger.error(f"Erro ao fechar o browser: {e}")
-                        
-                # Forçar a limpeza de referências
-                import gc
-                gc.collect()
-                
+
                 logger.info("Cleanup do browser concluído com sucesso.")
         except Exception as e:
             logger.error(f"Erro geral durante o cleanup do browser: {e}")
 
     def __del__(self):
-        """Ensure cleanup when object is destroyed."""
-        if self.browser is not None or self.context is not None:
-            try:
-                # Tentar obter o loop existente
-                try:
-                    loop = asyncio.get_event_loop()
-                    if loop.is_running():
-                        # Se o loop estiver em execução, agendar o cleanup
-                        loop.create_task(self.cleanup())
-                    else:
-                        # Se não estiver em execução, rodar diretamente
-                        loop.run_until_complete(self.cleanup())
-                except RuntimeError:
-                    # Se não houver um loop em execução, criar um novo
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    loop.run_until_complete(self.cleanup())
-                    loop.close()
-            except Exception as e:
-                # Em caso de erro, pelo menos limpar as referências
-                print(f"Error during browser cleanup: {e}")
-                self.browser = None
-                self.context = None
-                self.dom_service = None
+        """Agenda o cleanup caso a instância seja descartada com o navegador aberto"""
+        if getattr(self, "browser", None) is None and getattr(self, "context", None) is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Sem loop em execução (ex.: no encerramento do interpretador) não é possível fechar
+            # o navegador de forma assíncrona; um finalizador nunca cria um loop novo
+            return
+        task = loop.create_task(self.cleanup())
+        _CLEANUP_TASKS.add(task)
+        task.add_done_callback(_CLEANUP_TASKS.discard)
@@ -0,0 +1,131 @@
+from typing import Optional
+
+import aiohttp
+import html2text
+from pydantic import Field, PrivateAttr
+
+from app.logger import logger
+from app.tool.base import BaseTool, ToolResult
+from app.tool.browser_use_tool import MAX_HTML_LENGTH, MAX_TEXT_LENGTH, BrowserUseTool
+
+
+_FETCH_PAGE_DESCRIPTION = """Open a web page and return its content in a single call.
+Use this tool to read a URL (for example, one returned by web_search): it extracts the page's
+visible text (mode 'text', default) or its HTML (mode 'html').
+Static pages are fetched with a plain HTTP request; the browser is used automatically when the
+page needs JavaScript. Set render_js to true only to force the browser for such pages.
+Example: {"function": {"name": "fetch_page", "arguments": {"url": "https://exemplo.com", "mode": "text"}}}
+"""
+
+# Limite de tempo (segundos) da requisição HTTP direta antes de recorrer ao navegador
+HTTP_TIMEOUT = 10
+# Abaixo deste tamanho de texto a página provavelmente depende de JavaScript
+MIN_STATIC_TEXT_LENGTH = 200
+# Indícios de páginas que só exibem conteúdo com JavaScript
+JS_REQUIRED_MARKERS = ("enable javascript", "habilite o javascript", "ative o javascript")
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+}
+
+
+def html_to_text(html: str) -> str:
+    """Converte HTML em texto legível (sem links e imagens)"""
+    converter = html2text.HTML2Text()
+    converter.ignore_links = True
+    converter.ignore_images = True
+    converter.body_width = 0
+    return converter.handle(html).strip()
+
+
+class FetchPageTool(BaseTool):
+    name: str = "fetch_page"
+    description: str = _FETCH_PAGE_DESCRIPTION
+    parameters: dict = {
+        "type": "object",
+        "properties": {
+            "url": {
+                "type": "string",
+                "description": "(required) The URL of the page to read.",
+            },
+            "mode": {
+                "type": "string",
+                "description": "(optional) 'text' for the visible text or 'html' for the page HTML. Default is 'text'.",
+                "enum": ["text", "html"],
+                "default": "text",
+            },
+            "render_js": {
+                "type": "boolean",
+                "description": "(optional) Skip the plain HTTP request and render the page in the browser. Default is false.",
+                "default": False,
+            },
+        },
+        "required": ["url"],
+    }
+
+    # Navegador compartilhado com a ferramenta browser_use do agente
+    browser: Optional[BrowserUseTool] = Field(default=None, exclude=True)
+    # Sessão HTTP reaproveitada entre chamadas (conexões keep-alive)
+    _session: Optional[aiohttp.ClientSession] = PrivateAttr(default=None)
+
+    async def execute(self, url: str, mode: str = "text", render_js: bool = False, **kwargs) -> ToolResult:
+        """
+        Read the page at the URL, trying a plain HTTP request before the browser.
+
+        Args:
+            url: URL of the page to read
+            mode: 'text' for the visible text or 'html' for the page HTML
+            render_js: Go straight to the browser (for pages that need JavaScript)
+
+        Returns:
+            ToolResult with the page content or an error
+        """
+        if not url:
+            return ToolResult(error="URL is required for fetch_page")
+
+        if not render_js:
+            content = await self._http_fetch(url, mode)
+            if content is not None:
+                return ToolResult(output=content)
+
+        if self.browser is None:
+            return ToolResult(error=f"Could not fetch {url} over HTTP and no browser is available")
+        # get_text/get_html com url navegam e extraem sob o mesmo lock do navegador
+        action = "get_html" if mode == "html" else "get_text"
+        return await self.browser.execute(action=action, url=url)
+
+    async def _http_fetch(self, url: str, mode: str) -> Optional[str]:
+        """Obtém a página via HTTP; retorna None quando é preciso recorrer ao navegador"""
+        try:
+            if self._session is None or self._session.closed:
+                self._session = aiohttp.ClientSession(
+                    headers=HTTP_HEADERS,
+                    timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+                )
+            async with self._session.get(url, allow_redirects=True) as response:
+                content_type = response.headers.get("Content-Type", "")
+                if response.status != 200 or "html" not in content_type:
+                    logger.info("HTTP direto inadequado para {} (status {}, {})", url, response.status, content_type)
+                    return None
+                html = await response.text(errors="replace")
+        except Exception as e:
+            logger.info("HTTP direto falhou para {}: {}", url, e)
+            return None
+
+        text = html_to_text(html)
+        if len(text) < MIN_STATIC_TEXT_LENGTH or (
+            len(text) < MAX_TEXT_LENGTH and any(marker in html.lower() for marker in JS_REQUIRED_MARKERS)
+        ):
+            logger.info("Página {} parece depender de JavaScript; usando o navegador", url)
+            return None
+
+        logger.info("Página {} obtida via HTTP direto", url)
+        if mode == "html":
+            return html[:MAX_HTML_LENGTH]
+        return text[:MAX_TEXT_LENGTH]
+
+    async def cleanup(self):
+        """Fecha a sessão HTTP."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
@@ -1,10 +1,11 @@
-from app.tool.search.base import WebSearchEngine
+from app.tool.search.base import SimulatedResults, WebSearchEngine
 from app.tool.search.baidu_search import BaiduSearchEngine
 from app.tool.search.duckduckgo_search import DuckDuckGoSearchEngine
 from app.tool.search.google_search import GoogleSearchEngine
 
 
 __all__ = [
+    "SimulatedResults",
     "WebSearchEngine",
     "BaiduSearchEngine",
     "DuckDuckGoSearchEngine",
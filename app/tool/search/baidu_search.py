@@ -1,4 +1,3 @@
-from baidusearch.baidusearch import search
 from app.tool.search.base import WebSearchEngine
 
 
@@ -6,4 +5,7 @@ class BaiduSearchEngine(WebSearchEngine):
     
     def perform_search(self, query, num_results = 10, *args, **kwargs):
         """Baidu search engine."""
+        # Importado só na primeira busca: quem não usa o Baidu não paga a importação
+        from baidusearch.baidusearch import search
+
         return search(query, num_results=num_results)
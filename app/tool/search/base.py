@@ -1,3 +1,10 @@
+import asyncio
+
+
+class SimulatedResults(list):
+    """Placeholder links returned when every real search attempt failed; never cache them."""
+
+
 class WebSearchEngine(object):
     def perform_search(self, query: str, num_results: int = 10, *args, **kwargs) -> list[dict]:
         """
@@ -12,4 +19,20 @@ class WebSearchEngine(object):
         Returns:
             List: A list of dict matching the search query.
         """
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    async def aperform_search(self, query: str, num_results: int = 10, *args, **kwargs) -> list:
+        """
+        Run perform_search in a worker thread so the blocking HTTP calls don't stall the event loop.
+
+        The results are materialized in the thread as well, since engines may return lazy generators;
+        lists (including SimulatedResults) are returned as is.
+        """
+        def search():
+            results = self.perform_search(query, num_results, *args, **kwargs)
+            return results if isinstance(results, list) else list(results)
+
+        return await asyncio.to_thread(search)
+
+    def close(self) -> None:
+        """Release resources held between searches (sessions, connections)."""
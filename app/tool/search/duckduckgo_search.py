@@ -1,56 +1,156 @@
-from duckduckgo_search import DDGS
-import os
-import certifi
-import ssl
-from app.tool.search.base import WebSearchEngine
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import threading
+import time
+from typing import TYPE_CHECKING
+from urllib.parse import quote_plus
+
+from app.tool.search.base import SimulatedResults, WebSearchEngine
 from app.logger import logger
 
+if TYPE_CHECKING:
+    # Importado só na primeira busca: quem não usa o DuckDuckGo não paga a importação
+    from duckduckgo_search import DDGS
+
+
+# Tentativas de busca, na ordem em que são disparadas: (atraso em segundos, argumentos
+# do DDGS, argumentos do ddgs.text). As alternativas só começam se a anterior ainda
+# não tiver respondido após o atraso ("hedged requests"); vale o primeiro resultado.
+# O timeout do DDGS também é o tempo máximo que a busca espera por cada tentativa.
+SEARCH_ATTEMPTS = (
+    (0, {"timeout": 10}, {}),
+    # Backend alternativo; ambas as tentativas verificam os certificados TLS, pois as que
+    # entram na corrida rodam mesmo sem falha e o resultado vencedor vai para o cache
+    (2, {"timeout": 30}, {"safesearch": "off", "backend": "lite"}),
+)
+
+# URLs simuladas, usadas quando todas as tentativas falham
+ELON_MUSK_KEYWORDS = ("elon musk", "tesla")
+ELON_MUSK_URLS = (
+    "https://www.reuters.com/technology/elon-musk-latest-news",
+    "https://www.cnbc.com/tesla/",
+    "https://www.theverge.com/elon-musk",
+    "https://www.bloomberg.com/tesla-motors",
+    "https://www.bbc.com/news/topics/c302m85q5ljt/elon-musk",
+)
+GENERIC_SEARCH_URL_TEMPLATES = (
+    "https://www.reuters.com/search/news?blob={q}",
+    "https://www.bbc.com/search?q={q}",
+    "https://www.cnn.com/search?q={q}",
+    "https://www.theguardian.com/search?q={q}",
+    "https://news.google.com/search?q={q}",
+)
+
+# Threads das tentativas; as que perdem a corrida (ou passam do tempo limite) não podem ser
+# interrompidas e terminam em segundo plano, limitadas pelo timeout do próprio cliente
+_SEARCH_EXECUTOR = ThreadPoolExecutor(max_workers=6, thread_name_prefix="ddg_search")
+
 
 class DuckDuckGoSearchEngine(WebSearchEngine):
-    
+
+    def __init__(self):
+        # Um cliente DDGS por tentativa, reaproveitado entre buscas (conexões e TLS já estabelecidos),
+        # com um lock próprio: o DDGS não é seguro para uso simultâneo em várias threads
+        self._sessions: dict[int, tuple["DDGS", threading.Lock]] = {}
+        self._sessions_lock = threading.Lock()
+
+    def _get_session(self, attempt: int) -> tuple["DDGS", threading.Lock]:
+        from duckduckgo_search import DDGS
+
+        with self._sessions_lock:
+            session = self._sessions.get(attempt)
+            if session is None:
+                session = self._sessions[attempt] = (DDGS(**SEARCH_ATTEMPTS[attempt][1]), threading.Lock())
+            return session
+
+    def _search(self, attempt, query, num_results):
+        from duckduckgo_search import DDGS
+        from duckduckgo_search.exceptions import RatelimitException
+
+        session, lock = self._get_session(attempt)
+        if not lock.acquire(blocking=False):
+            # Cliente ocupado (por exemplo, com a tentativa perdedora de uma busca anterior):
+            # usar um cliente avulso em vez de esperar por ele
+            return self._text(DDGS(**SEARCH_ATTEMPTS[attempt][1]), attempt, query, num_results)
+        try:
+            return self._text(session, attempt, query, num_results)
+        except RatelimitException:
+            raise
+        except Exception:
+            # Falha de transporte: o próximo uso cria um cliente novo
+            with self._sessions_lock:
+                if self._sessions.get(attempt, (None,))[0] is session:
+                    del self._sessions[attempt]
+            raise
+        finally:
+            lock.release()
+
+    @staticmethod
+    def _text(session: "DDGS", attempt, query, num_results):
+        return [r['href'] for r in session.text(query, max_results=num_results, **SEARCH_ATTEMPTS[attempt][2])]
+
+    def close(self):
+        """Descarta os clientes DDGS."""
+        with self._sessions_lock:
+            self._sessions.clear()
+
     def perform_search(self, query, num_results = 10, *args, **kwargs):
         """DuckDuckGo search engine com fallback para URLs simuladas quando falha."""
-        try:
-            # Configurar ambiente para ignorar problemas de certificados se houver erro
-            # Primeiro, tente com configuração normal
-            with DDGS() as ddgs:
-                results = [r['href'] for r in ddgs.text(query, max_results=num_results)]
-                return results
-        except Exception as e:
-            logger.warning(f"DDG search failed with error: {e}. Trying with SSL verification disabled.")
-            try:
-                # Desabilitar verificação SSL para contornar erros de certificados
-                os.environ['PYTHONHTTPSVERIFY'] = '0'
-                with DDGS(safesearch='off', timeout=20) as ddgs:
-                    results = [r['href'] for r in ddgs.text(query, max_results=num_results)]
-                    return results
-            except Exception as e2:
-                logger.error(f"DDG search failed even with SSL verification disabled: {e2}")
-                # Tentar com method= alternativo como último recurso
+        results = self._hedged_search(query, num_results)
+        if results is not None:
+            return results
+
+        logger.error("All DDG search methods failed. Using simulated URLs for demonstration.")
+        # Criar URLs simuladas para demonstração
+        query_keywords = query.lower()
+        if any(keyword in query_keywords for keyword in ELON_MUSK_KEYWORDS):
+            return SimulatedResults(ELON_MUSK_URLS)
+        # URLs genéricas para qualquer outra consulta
+        search_term = quote_plus(query)
+        return SimulatedResults(template.format(q=search_term) for template in GENERIC_SEARCH_URL_TEMPLATES)
+
+    def _hedged_search(self, query, num_results):
+        """
+        Dispara as tentativas escalonadas e retorna o primeiro resultado não vazio; uma lista
+        vazia se alguma tentativa responder sem erros mas sem resultados, ou None se todas
+        falharem ou expirarem.
+        """
+        start = time.monotonic()
+        answered = False
+        # Tentativa em andamento -> instante a partir do qual ela é abandonada
+        deadlines = {}
+        attempts = iter(enumerate(SEARCH_ATTEMPTS))
+        next_attempt = next(attempts, None)
+        while next_attempt is not None or deadlines:
+            # Iniciar as tentativas cujo atraso já passou (ou imediatamente, se nenhuma está em andamento)
+            while next_attempt is not None and (not deadlines or time.monotonic() - start >= next_attempt[1][0]):
+                attempt, (_, ddgs_kwargs, _) = next_attempt
+                future = _SEARCH_EXECUTOR.submit(self._search, attempt, query, num_results)
+                deadlines[future] = time.monotonic() + ddgs_kwargs["timeout"]
+                next_attempt = next(attempts, None)
+
+            # Acordar no próximo início de tentativa ou no primeiro tempo limite
+            wake_at = min(deadlines.values())
+            if next_attempt is not None:
+                wake_at = min(wake_at, start + next_attempt[1][0])
+            done, _ = wait(deadlines, timeout=max(0, wake_at - time.monotonic()), return_when=FIRST_COMPLETED)
+            for future in done:
+                del deadlines[future]
                 try:
-                    with DDGS(safesearch='off', timeout=30, backend="lite") as ddgs:
-                        results = [r['href'] for r in ddgs.text(query, max_results=num_results)]
-                        return results
-                except Exception as e3:
-                    logger.error(f"All DDG search methods failed: {e3}. Using simulated URLs for demonstration.")
-                    
-                    # Criar URLs simuladas para demonstração
-                    query_keywords = query.lower()
-                    if "elon musk" in query_keywords or "tesla" in query_keywords:
-                        return [
-                            "https://www.reuters.com/technology/elon-musk-latest-news",
-                            "https://www.cnbc.com/tesla/",
-                            "https://www.theverge.com/elon-musk",
-                            "https://www.bloomberg.com/tesla-motors",
-                            "https://www.bbc.com/news/topics/c302m85q5ljt/elon-musk"
-                        ]
-                    else:
-                        # URLs genéricas para qualquer outra consulta
-                        search_term = query.replace(" ", "+")
-                        return [
-                            f"https://www.reuters.com/search/news?blob={search_term}",
-                            f"https://www.bbc.com/search?q={search_term}",
-                            f"https://www.cnn.com/search?q={search_term}",
-                            f"https://www.theguardian.com/search?q={search_term}",
-                            f"https://news.google.com/search?q={search_term}"
-                        ]
+                    results = future.result()
+                except Exception as e:
+                    logger.warning(f"DDG search attempt failed with error: {e}")
+                    continue
+                answered = True
+                if results:
+                    # cancel() só impede as que ainda não começaram; as demais terminam sozinhas
+                    for loser in deadlines:
+                        loser.cancel()
+                    return results
+
+            now = time.monotonic()
+            for future in [future for future, deadline in deadlines.items() if deadline <= now]:
+                logger.warning("DDG search attempt timed out; abandoning it")
+                future.cancel()
+                del deadlines[future]
+        # Uma busca que realmente não encontrou nada não usa as URLs simuladas
+        return [] if answered else None
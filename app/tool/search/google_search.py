@@ -1,8 +1,10 @@
 from app.tool.search.base import WebSearchEngine
-import googlesearch
 
 class GoogleSearchEngine(WebSearchEngine):
     
     def perform_search(self, query, num_results = 10, *args, **kwargs):
         """Google search engine."""
+        # Importado só na primeira busca: quem não usa o Google não paga a importação
+        import googlesearch
+
         return googlesearch.search(query, num_results=num_results)
@@ -5,17 +5,76 @@ ser usado quando o método browser_use com get_html ou get_text falhar.
 """
 
 import asyncio
+import functools
 import logging
+import os
+import re
+from typing import Any, ClassVar, List, Optional
+
+from app.config import config
 from app.tool.base import BaseTool, ToolResult
-from playwright.async_api import async_playwright
+from app.tool.browser_use_tool import BROWSER_POOL, BrowserPool, create_browser
 
 logger = logging.getLogger(__name__)
 
+# Número máximo de abas abertas ao mesmo tempo no navegador compartilhado
+CONCURRENT_TABS = int(os.environ.get("OPENMANUS_CONCURRENT_TABS", "5"))
+
+# Navegadores headless do extrator, usados quando o browser_use está configurado com janela
+# visível (headless = false): a extração nunca abre janelas na tela
+HEADLESS_BROWSER_POOL = BrowserPool()
+
+# Tempo máximo (ms) de espera por conteúdo dinâmico após o DOMContentLoaded
+CONTENT_WAIT_TIMEOUT_MS = 3000
+# Condição que indica que a página já tem texto suficiente para ser extraído
+JS_HAS_CONTENT = "() => document.body && document.body.innerText.length > 200"
+
+# Estratégias de extração, em ordem: texto dos elementos de texto comuns,
+# textContent do body e, por fim, innerText; retorna o primeiro resultado não vazio
+JS_EXTRACT_TEXT = """() => {
+    const elements = Array.from(document.querySelectorAll('p, h1, h2, h3, h4, h5, h6, li, td, th'))
+        .map(el => el.textContent.trim())
+        .filter(text => text.length > 0)
+        .join('\\n');
+    if (elements && elements.length > 50) return elements;
+    const body = document.body;
+    if (!body) return '';
+    return body.textContent || body.innerText || '';
+}"""
+# Define a função de extração em cada documento do contexto, antes dos scripts da página;
+# a extração em si só chama a função (null se a página não a tiver, ex.: documentos não HTML)
+JS_DEFINE_EXTRACT_TEXT = f"window.__extractText = {JS_EXTRACT_TEXT};"
+JS_CALL_EXTRACT_TEXT = "() => typeof window.__extractText === 'function' ? window.__extractText() : null"
+
+# Tamanho máximo do texto retornado
+MAX_TEXT_LENGTH = 2000
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_text(text: str, max_length: int) -> str:
+    """
+    Colapsa os espaços em branco e limita o texto a max_length caracteres.
+
+    Só o início do texto é normalizado (com folga para os espaços que serão colapsados),
+    em vez de percorrer o documento inteiro que seria descartado em seguida.
+    """
+    window = max_length * 8
+    while True:
+        normalized = WHITESPACE_PATTERN.sub(" ", text[:window]).strip()
+        if len(normalized) > max_length or window >= len(text):
+            break
+        window *= 2
+    if len(normalized) > max_length:
+        return normalized[:max_length] + "... (texto truncado)"
+    return normalized
+
 
 class SimpleTextExtractor(BaseTool):
     """
     Ferramenta para extrair texto de páginas web de forma simples e robusta.
-    Usa diretamente o Playwright sem depender da implementação complexa do browser_use.
+    Usa diretamente o Playwright sem depender da implementação complexa do browser_use
+    (apenas o navegador é compartilhado com ele, pelo BROWSER_POOL, quando o [browser] do
+    config.toml é headless; caso contrário usa um navegador headless próprio).
     """
 
     name: str = "simple_text_extract"
@@ -40,6 +99,42 @@ class SimpleTextExtractor(BaseTool):
         "required": ["url"],
     }
 
+    # Navegador headless obtido sob demanda: o do BROWSER_POOL (o mesmo processo do Chromium e
+    # do driver do Playwright usados pelo browser_use) quando ele já é headless, senão um do
+    # HEADLESS_BROWSER_POOL; cada extração usa um contexto novo, isolando cookies e armazenamento
+    _pool: ClassVar[Optional[BrowserPool]] = None
+    _pool_browser: ClassVar[Optional[Any]] = None
+    _browser: ClassVar[Optional[Any]] = None
+    _browser_lock: ClassVar[asyncio.Lock] = asyncio.Lock()
+    _tab_semaphore: ClassVar[asyncio.Semaphore] = asyncio.Semaphore(CONCURRENT_TABS)
+
+    @classmethod
+    async def _get_browser(cls):
+        """Retorna o navegador do Playwright compartilhado, obtendo-o do pool na primeira chamada"""
+        if cls._browser is not None:
+            return cls._browser
+        async with cls._browser_lock:
+            if cls._browser is None:
+                logger.info("Obtendo navegador headless para o extrator de texto")
+                shares_browser = config.browser_config is not None and config.browser_config.headless
+                cls._pool = BROWSER_POOL if shares_browser else HEADLESS_BROWSER_POOL
+                cls._pool_browser = await cls._pool.acquire(functools.partial(create_browser, headless=True))
+                cls._browser = await cls._pool_browser.get_playwright_browser()
+            return cls._browser
+
+    @classmethod
+    async def close_all(cls):
+        """Devolve o navegador ao pool (fechado quando ninguém mais o usa)"""
+        async with cls._browser_lock:
+            pool, cls._pool = cls._pool, None
+            pool_browser, cls._pool_browser = cls._pool_browser, None
+            cls._browser = None
+        if pool_browser is not None:
+            try:
+                await pool.release(pool_browser)
+            except Exception as e:
+                logger.warning(f"Erro ao fechar o navegador do extrator de texto: {str(e)}")
+
     async def execute(self, url: str, timeout: int = 30) -> ToolResult:
         """
         Executa a extração de texto da URL especificada.
@@ -68,6 +163,48 @@ class SimpleTextExtractor(BaseTool):
             logger.error(f"Erro ao extrair texto: {str(e)}")
             return ToolResult(error=f"Erro ao extrair texto: {str(e)}")
 
+    async def execute_many(self, urls: List[str], timeout: int = 30, concurrency: int = CONCURRENT_TABS) -> List[ToolResult]:
+        """
+        Extrai o texto de várias URLs em paralelo, no navegador compartilhado.
+        
+        Args:
+            urls: URLs das páginas web para extrair texto
+            timeout: Tempo máximo de espera em segundos, por URL
+            concurrency: Número máximo de extrações simultâneas
+            
+        Returns:
+            Um ToolResult por URL, na mesma ordem das URLs
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def extract(url: str) -> ToolResult:
+            async with semaphore:
+                return await self.execute(url, timeout=timeout)
+
+        return await asyncio.gather(*(extract(url) for url in urls))
+
+    async def _wait_for_content(self, page) -> None:
+        """
+        Aguarda o conteúdo dinâmico: termina assim que a rede ficar ociosa ou a página
+        já tiver texto suficiente, limitado a CONTENT_WAIT_TIMEOUT_MS.
+        """
+        waiters = [
+            asyncio.create_task(page.wait_for_load_state("networkidle", timeout=CONTENT_WAIT_TIMEOUT_MS)),
+            asyncio.create_task(page.wait_for_function(JS_HAS_CONTENT, timeout=CONTENT_WAIT_TIMEOUT_MS)),
+        ]
+        pending = set(waiters)
+        try:
+            # Uma espera que falha (timeout ou erro) não encerra as demais
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if any(not task.cancelled() and task.exception() is None for task in done):
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            # Recolher os timeouts e cancelamentos das esperas descartadas
+            await asyncio.gather(*waiters, return_exceptions=True)
+
     async def _extract_text(self, url: str) -> str:
         """
         Implementação interna da extração de texto usando Playwright diretamente.
@@ -78,69 +215,37 @@ class SimpleTextExtractor(BaseTool):
         Returns:
             Texto extraído da página
         """
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
+        async with self._tab_semaphore:
+            browser = await self._get_browser()
+            context = await browser.new_context()
             
             try:
-                context = await browser.new_context()
+                await context.add_init_script(JS_DEFINE_EXTRACT_TEXT)
                 page = await context.new_page()
                 
                 # Navegar para a URL
                 try:
                     await page.goto(url, wait_until="domcontentloaded", timeout=20000)
-                    # Aguardar um pouco mais para conteúdo dinâmico
-                    await asyncio.sleep(3)
+                    await self._wait_for_content(page)
                 except Exception as e:
                     logger.error(f"Erro ao navegar para {url}: {str(e)}")
                     return f"Erro de navegação: {str(e)}"
                 
-                # Tentar várias estratégias de extração de texto
+                # Todas as estratégias de extração numa única chamada ao navegador
                 text = ""
-                
-                # Estratégia 1: Texto dos elementos de texto comuns
                 try:
-                    text_elements = await page.evaluate("""
-                        Array.from(document.querySelectorAll('p, h1, h2, h3, h4, h5, h6, li, td, th'))
-                            .map(el => el.textContent.trim())
-                            .filter(text => text.length > 0)
-                            .join('\\n')
-                    """)
-                    
-                    if text_elements and len(text_elements) > 50:
-                        text = text_elements
+                    text = await page.evaluate(JS_CALL_EXTRACT_TEXT)
+                    if text is None:
+                        text = await page.evaluate(JS_EXTRACT_TEXT)
                 except Exception as e:
-                    logger.warning(f"Falha na estratégia 1: {str(e)}")
-                
-                # Se a estratégia 1 falhar, tente a estratégia 2
-                if not text:
-                    try:
-                        body_text = await page.evaluate("document.body.textContent")
-                        if body_text:
-                            text = body_text
-                    except Exception as e:
-                        logger.warning(f"Falha na estratégia 2: {str(e)}")
-                
-                # Se ambas falharem, tente uma abordagem muito básica
-                if not text:
-                    try:
-                        # Tentar obter texto através de innerText
-                        simple_text = await page.evaluate("document.body.innerText")
-                        text = simple_text
-                    except Exception as e:
-                        logger.warning(f"Falha na estratégia 3: {str(e)}")
+                    logger.warning(f"Falha na extração de texto: {str(e)}")
                 
                 # Limpar o texto
                 if text:
-                    # Eliminar espaços em branco extras e quebras de linha múltiplas
-                    text = ' '.join(text.split())
-                    text = text.replace('\t', ' ').replace('\r', '')
-                    
-                    # Limitar o tamanho para evitar problemas
-                    max_length = 2000
-                    if len(text) > max_length:
-                        text = text[:max_length] + "... (texto truncado)"
+                    text = normalize_text(text, MAX_TEXT_LENGTH)
                 
                 return text or "Não foi possível extrair texto da página"
                 
             finally:
-                await browser.close()
+                # Apenas o contexto é fechado; o navegador continua disponível
+                await context.close()
@@ -27,7 +27,7 @@ class Terminate(BaseTool):
         "required": ["message"]
     }
 
-    async def execute(self, status: str = "completed", message: str = "", **kwargs) -> str:
+    def execute(self, status: str = "completed", message: str = "", **kwargs) -> str:
         """Finaliza a execução atual e retorna uma mensagem para o usuário"""
         if message:
             return message
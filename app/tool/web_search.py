@@ -1,16 +1,23 @@
-import asyncio
-from typing import List
+import time
+from collections import OrderedDict
+from typing import ClassVar, List, Tuple
 
 from app.tool.base import BaseTool
 from app.config import config
-from app.tool.search import WebSearchEngine, BaiduSearchEngine, GoogleSearchEngine, DuckDuckGoSearchEngine
+from app.tool.search import SimulatedResults, WebSearchEngine, BaiduSearchEngine, GoogleSearchEngine, DuckDuckGoSearchEngine
+
+
+# Resultados de busca reaproveitados por SEARCH_CACHE_TTL segundos (no máximo SEARCH_CACHE_SIZE consultas)
+SEARCH_CACHE_TTL = 300
+SEARCH_CACHE_SIZE = 256
 
 
 class WebSearch(BaseTool):
     name: str = "web_search"
     description: str = """Perform a web search and return a list of relevant links.
 Use this tool when you need to find information on the web, get up-to-date data, or research specific topics.
-The tool returns a list of URLs that match the search query.
+The tool returns a list of URLs that match the search query; it does NOT return page content.
+After searching, use fetch_page to read one of the returned URLs and extract the information.
 """
     parameters: dict = {
         "type": "object",
@@ -27,11 +34,15 @@ The tool returns a list of URLs that match the search query.
         },
         "required": ["query"],
     }
-    _search_engine: dict[str, WebSearchEngine] = {
+    # Compartilhados entre instâncias (e não copiados por instância, como um atributo privado
+    # do pydantic seria), para que as sessões dos mecanismos de busca sejam reaproveitadas
+    _search_engine: ClassVar[dict[str, WebSearchEngine]] = {
         "google": GoogleSearchEngine(),
         "baidu": BaiduSearchEngine(),
         "duckduckgo": DuckDuckGoSearchEngine(),
     }
+    # (mecanismo, consulta, número de resultados) -> (instante, links), do mais antigo ao mais recente
+    _cache: ClassVar["OrderedDict[Tuple[str, str, int], Tuple[float, List[str]]]"] = OrderedDict()
 
     async def execute(self, query: str, num_results: int = 10) -> List[str]:
         """
@@ -44,14 +55,22 @@ The tool returns a list of URLs that match the search query.
         Returns:
             List[str]: A list of URLs matching the search query.
         """
-        # Run the search in a thread pool to prevent blocking
-        loop = asyncio.get_event_loop()
         search_engine = self.get_search_engine()
-        links = await loop.run_in_executor(
-            None, lambda: list(search_engine.perform_search(query, num_results=num_results))
-        )
+        key = (type(search_engine).__name__, query, num_results)
+        cached = self._cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < SEARCH_CACHE_TTL:
+            self._cache.move_to_end(key)
+            return list(cached[1])
 
-        return links
+        links = await search_engine.aperform_search(query, num_results=num_results)
+
+        # Só resultados reais vão para o cache; os links simulados de um fallback não
+        if links and not isinstance(links, SimulatedResults):
+            self._cache[key] = (time.monotonic(), links)
+            self._cache.move_to_end(key)
+            while len(self._cache) > SEARCH_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return list(links)
 
     def get_search_engine(self) -> WebSearchEngine:
         """Determines the search engine to use based on the configuration."""
@@ -61,3 +80,8 @@ The tool returns a list of URLs that match the search query.
         else:
             engine = config.search_config.engine.lower()
             return self._search_engine.get(engine, default_engine)
+
+    async def cleanup(self):
+        """Release the search engines' sessions."""
+        for engine in self._search_engine.values():
+            engine.close()
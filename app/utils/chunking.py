@@ -14,6 +14,33 @@ import uuid
 from app.logger import logger
 
 
+# Pontos de divisão semântica, em ordem de prioridade (compilados uma única vez)
+SEMANTIC_BOUNDARY_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    # Fronteiras de documento
+    r"\n#{1,6}\s+",  # Cabeçalhos markdown/documento
+    r"\n\s*<h[1-6]>",  # Cabeçalhos HTML
+    
+    # Fronteiras de parágrafo
+    r"\n\s*\n",  # Parágrafos
+    
+    # Fronteiras de sentença
+    r"(?<=[.!?])\s+",  # Fim de sentença
+    
+    # Fronteiras lógicas em código
+    r"\n\s*(?:def|class)\s+",  # Definições Python
+    r"\n\s*(?:function|class|const|let|var)\s+",  # Definições JavaScript
+    r"\n\s*(?:public|private|protected|class|void)\s+",  # Definições Java/C#
+))
+
+# Início de definições (funções, classes) em cada linguagem (compilados uma única vez)
+CODE_DEFINITION_PATTERNS = {
+    'python': re.compile(r'(\n|^)(?:def\s+\w+|class\s+\w+|@\w+|if\s+__name__\s*==)'),
+    'javascript': re.compile(r'(\n|^)(?:function\s+\w+|class\s+\w+|const\s+\w+\s*=\s*(?:function|\(.*?\)\s*=>)|let\s+\w+\s*=)'),
+    'java': re.compile(r'(\n|^)(?:public\s+class|private\s+class|protected\s+class|class\s+\w+|public\s+\w+\s+\w+\s*\()'),
+    'generic': re.compile(r'(\n|^)(?:function\s+\w+|class\s+\w+|\w+\s*\(.*?\)\s*\{|\w+\s*=\s*function|\w+\s*=>\s*\{)'),
+}
+
+
 class ChunkStrategy:
     """Estratégia base para chunking de conteúdo"""
     
@@ -39,13 +66,21 @@ class FixedSizeChunkStrategy(ChunkStrategy):
         Returns:
             Lista de strings, cada uma representando um chunk.
         """
-        chunks = []
-        for i in range(0, len(content), self.max_chunk_size - self.overlap_size):
-            end = min(i + self.max_chunk_size, len(content))
-            chunk = content[i:end]
-            chunks.append(chunk)
+        return [content[start:end] for start, end in self.split_indices(content)]
+    
+    def split_indices(self, content: str) -> List[Tuple[int, int]]:
+        """
+        Calcula os limites dos chunks sem copiar o conteúdo.
         
-        return chunks
+        Args:
+            content: Conteúdo a ser dividido.
+            
+        Returns:
+            Lista de tuplas (início, fim), uma por chunk, para fatiar o conteúdo sob demanda.
+        """
+        length = len(content)
+        step = self.max_chunk_size - self.overlap_size
+        return [(start, min(start + self.max_chunk_size, length)) for start in range(0, length, step)]
 
 
 class RecursiveChunkStrategy(ChunkStrategy):
@@ -142,23 +177,8 @@ class SemanticChunkStrategy(ChunkStrategy):
     
     def __init__(self, max_chunk_size: int = 8000, overlap_size: int = 500):
         super().__init__(max_chunk_size, overlap_size)
-        # Define pontos de divisão semântica com prioridade
-        self.semantic_boundaries = [
-            # Fronteiras de documento
-            r"\n#{1,6}\s+",  # Cabeçalhos markdown/documento
-            r"\n\s*<h[1-6]>",  # Cabeçalhos HTML
-            
-            # Fronteiras de parágrafo
-            r"\n\s*\n",  # Parágrafos
-            
-            # Fronteiras de sentença
-            r"(?<=[.!?])\s+",  # Fim de sentença
-            
-            # Fronteiras lógicas em código
-            r"\n\s*(?:def|class)\s+",  # Definições Python
-            r"\n\s*(?:function|class|const|let|var)\s+",  # Definições JavaScript
-            r"\n\s*(?:public|private|protected|class|void)\s+",  # Definições Java/C#
-        ]
+        # Pontos de divisão semântica com prioridade (padrões compilados uma única vez)
+        self.semantic_boundaries = SEMANTIC_BOUNDARY_PATTERNS
     
     def split(self, content: str) -> List[str]:
         """
@@ -180,7 +200,7 @@ class SemanticChunkStrategy(ChunkStrategy):
             splits = []
             last_end = 0
             
-            for match in re.finditer(boundary_pattern, content):
+            for match in boundary_pattern.finditer(content):
                 start = match.start()
                 # Adicionar o texto até o ponto de divisão
                 if start > last_end:
@@ -371,13 +391,8 @@ class CodeChunkStrategy(ChunkStrategy):
     
     def __init__(self, max_chunk_size: int = 8000, overlap_size: int = 500):
         super().__init__(max_chunk_size, overlap_size)
-        # Padrões para diferentes linguagens
-        self.language_patterns = {
-            'python': r'(\n|^)(?:def\s+\w+|class\s+\w+|@\w+|if\s+__name__\s*==)',
-            'javascript': r'(\n|^)(?:function\s+\w+|class\s+\w+|const\s+\w+\s*=\s*(?:function|\(.*?\)\s*=>)|let\s+\w+\s*=)',
-            'java': r'(\n|^)(?:public\s+class|private\s+class|protected\s+class|class\s+\w+|public\s+\w+\s+\w+\s*\()',
-            'generic': r'(\n|^)(?:function\s+\w+|class\s+\w+|\w+\s*\(.*?\)\s*\{|\w+\s*=\s*function|\w+\s*=>\s*\{)'
-        }
+        # Padrões para diferentes linguagens (compilados uma única vez)
+        self.language_patterns = CODE_DEFINITION_PATTERNS
     
     def split(self, content: str) -> List[str]:
         """
@@ -394,7 +409,7 @@ class CodeChunkStrategy(ChunkStrategy):
         pattern = self.language_patterns.get(language, self.language_patterns['generic'])
         
         # Encontrar pontos de definição na estrutura do código
-        matches = list(re.finditer(pattern, content))
+        matches = list(pattern.finditer(content))
         
         # Se não encontrou pontos de definição, usar chunking por linhas
         if not matches:
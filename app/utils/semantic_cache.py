@@ -0,0 +1,111 @@
+"""
+Cache semântico de respostas finais do agente.
+
+Tarefas com texto parecido (mesma intenção, palavras diferentes) reaproveitam a resposta
+já produzida em vez de repetir toda a cadeia LLM + busca + navegador.
+"""
+
+import re
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.logger import logger
+
+
+# Tarefas sobre informações que mudam com o tempo nunca são respondidas do cache
+# (mesma lista do SYSTEM_PROMPT: data atual, preços, notícias, clima)
+TIME_SENSITIVE_PATTERN = re.compile(
+    r"\b(?:data|hoje|agora|atual\w*|hor[áa]rio|horas?|pre[çc]os?|cota[çc][ãa]o|"
+    r"not[íi]cias?|[úu]ltim[oa]s?|recentes?|clima|tempo|previs[ãa]o|"
+    r"today|now|current|price|news|weather|latest)\b",
+    re.IGNORECASE,
+)
+
+
+def is_time_sensitive(text: str) -> bool:
+    """Indica se a tarefa depende de informações que mudam com o tempo"""
+    return TIME_SENSITIVE_PATTERN.search(text) is not None
+
+
+class SemanticCache:
+    """
+    Cache de respostas indexado por embeddings, com busca por similaridade de cosseno.
+
+    As entradas expiram após `ttl` segundos e o cache guarda no máximo `max_entries`
+    respostas (as mais antigas são descartadas primeiro).
+    """
+
+    def __init__(self, threshold: float = 0.92, ttl: float = 3600.0, max_entries: int = 256):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Vetores normalizados (uma linha por entrada) e, em paralelo, (instante, resposta)
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Tuple[float, str]] = []
+
+    def _expire(self) -> None:
+        """Remove entradas expiradas (sempre as mais antigas, no início)"""
+        cutoff = time.monotonic() - self.ttl
+        expired = 0
+        while expired < len(self._entries) and self._entries[expired][0] < cutoff:
+            expired += 1
+        if expired:
+            del self._entries[:expired]
+            self._vectors = self._vectors[expired:] if self._entries else None
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def get(self, embedding: Sequence[float]) -> Optional[str]:
+        """
+        Retorna a resposta mais parecida com o embedding, se a similaridade atingir o limiar.
+
+        Args:
+            embedding: Embedding da tarefa
+
+        Returns:
+            Resposta em cache ou None
+        """
+        self._expire()
+        vector = self._normalize(embedding)
+        if vector is None or self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+            return None
+        similarities = self._vectors @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        logger.info("Resposta encontrada no cache semântico (similaridade {:.3f})", float(similarities[best]))
+        return self._entries[best][1]
+
+    def put(self, embedding: Sequence[float], answer: str) -> None:
+        """
+        Armazena a resposta associada ao embedding da tarefa.
+
+        Args:
+            embedding: Embedding da tarefa
+            answer: Resposta final produzida pelo agente
+        """
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+        self._expire()
+        if self._vectors is not None and self._vectors.shape[1] != vector.shape[0]:
+            # Modelo de embedding mudou: vetores antigos não são comparáveis
+            self.clear()
+        self._entries.append((time.monotonic(), answer))
+        row = vector[np.newaxis, :]
+        self._vectors = row if self._vectors is None else np.vstack((self._vectors, row))
+        if len(self._entries) > self.max_entries:
+            excess = len(self._entries) - self.max_entries
+            del self._entries[:excess]
+            self._vectors = self._vectors[excess:]
+
+    def clear(self) -> None:
+        """Remove todas as entradas."""
+        self._vectors = None
+        self._entries = []
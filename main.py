@@ -8,6 +8,8 @@ import argparse
 from app.agent.manus import Manus
 from app.agent.content_processor import ContentProcessor
 from app.utils.chunking import ChunkProcessor
+from app.llm import LLM
+from app.tool.simple_text_extractor import SimpleTextExtractor
 from app.logger import logger
 from app.schema import Message
 
@@ -125,12 +127,18 @@ async def cleanup_resources(agent):
         # Fechar sessão do LLM
         if hasattr(agent, 'llm') and agent.llm:
             try:
-                logger.info("Closing LLM session...")
-                await agent.llm.close()
-                logger.info("LLM session closed successfully")
+                logger.info("Closing LLM sessions...")
+                await LLM.close_all()
+                logger.info("LLM sessions closed successfully")
             except Exception as e:
                 logger.warning(f"Error closing LLM session: {e}")
 
+        # Fechar o navegador compartilhado do extrator de texto, se tiver sido iniciado
+        try:
+            await SimpleTextExtractor.close_all()
+        except Exception as e:
+            logger.warning(f"Error closing text extractor browser: {e}")
+
         # Limpar o processador de conteúdo, se existir
         if hasattr(agent, 'content_processor') and agent.content_processor:
             logger.info("Cleaning up content processor...")
@@ -4,6 +4,7 @@ import time
 from app.agent.manus import Manus
 from app.flow.base import FlowType
 from app.flow.flow_factory import FlowFactory
+from app.llm import LLM
 from app.logger import logger
 
 
@@ -44,6 +45,9 @@ async def run_flow():
         logger.info("Operation cancelled by user.")
     except Exception as e:
         logger.error(f"Error: {str(e)}")
+    finally:
+        # Fechar as sessões HTTP abertas com o Ollama
+        await LLM.close_all()
 
 
 if __name__ == "__main__":
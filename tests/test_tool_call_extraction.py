@@ -0,0 +1,83 @@
+"""
+Teste para verificar a extração de chamadas de ferramenta de respostas em texto livre,
+inclusive quando a prosa contém chaves ou aspas soltas.
+"""
+import sys
+import os
+import time
+
+# Adicionar o diretório pai ao path para importar os módulos do projeto
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.llm import LLM
+
+CASES = [
+    (
+        "Chave solta antes do objeto",
+        'Use { aqui. {"action": "navigate", "url": "https://a.com"}',
+        ("browser_use", {"action": "navigate", "url": "https://a.com"}),
+    ),
+    (
+        "Aspa solta dentro de chave aberta",
+        'Veja {"a. {"query": "clima hoje"}',
+        ("web_search", {"query": "clima hoje"}),
+    ),
+    (
+        "Objeto inválido antes do válido",
+        '{tool: x} e depois {"tool_name": "terminate", "arguments": {"status": "success"}}',
+        ("terminate", {"status": "success"}),
+    ),
+    (
+        "web_search depois de browser_use com argumentos nomeados",
+        'browser_use(action="navigate", url="https://b.com")\nweb_search("noticias")',
+        ("web_search", {"query": "noticias"}),
+    ),
+    (
+        "web_search depois de browser_use com argumentos posicionais",
+        'browser_use("navigate", "https://b.com")\n\nweb_search("noticias")',
+        ("web_search", {"query": "noticias"}),
+    ),
+]
+
+# Entradas sem chamada válida que forçam recomeços a cada chave; devem levar tempo linear
+ADVERSARIAL_INPUTS = [
+    ("Chaves e aspas sem fechamento", '{"a" ' * 8000 + "}"),
+    ("Chaves soltas na prosa", "x {" * 8000),
+    ("Aspas escapadas alternando o estado de string", '{"\\"' * 8000),
+]
+# Tempo máximo (segundos) por entrada adversária
+MAX_EXTRACTION_SECONDS = 1.0
+
+
+def test_tool_call_extraction():
+    """Confere que cada resposta produz a chamada de ferramenta esperada."""
+    llm = LLM.__new__(LLM)
+    failures = 0
+    for name, response_text, expected in CASES:
+        result = llm.extract_tool_call(response_text, [])
+        status = "OK" if result == expected else "FALHOU"
+        if result != expected:
+            failures += 1
+        print(f"[{status}] {name}: {result}")
+    return failures == 0
+
+
+def test_tool_call_extraction_time():
+    """Confere que entradas adversárias não tornam a extração quadrática."""
+    llm = LLM.__new__(LLM)
+    failures = 0
+    for name, response_text in ADVERSARIAL_INPUTS:
+        started = time.perf_counter()
+        llm.extract_tool_call(response_text, [])
+        elapsed = time.perf_counter() - started
+        status = "OK" if elapsed < MAX_EXTRACTION_SECONDS else "FALHOU"
+        if elapsed >= MAX_EXTRACTION_SECONDS:
+            failures += 1
+        print(f"[{status}] {name}: {elapsed:.3f}s")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    passed = test_tool_call_extraction()
+    passed = test_tool_call_extraction_time() and passed
+    sys.exit(0 if passed else 1)